@@ -1,8 +1,12 @@
 from agents.tools import rag_tools
+from agents.tools.tool_runtime import Memo, ToolRuntime
+from utils.env_loader import EnvLoader
 from llama_index.core.agent import ReActAgent
 from llama_index.llms.ollama import Ollama
-from typing import Optional
+from typing import Iterator, Optional
 from llama_index.core.tools import FunctionTool
+from llama_index.core.memory import ChatMemoryBuffer
+from llama_index.core.chat_engine.types import StreamingAgentChatResponse
 
 
 # ============================================================
@@ -15,26 +19,88 @@ class RagAgent:
         tools: Optional[list[FunctionTool]] = None,
     ):
         self.llm = Ollama(model=model_name, temperature=0, request_timeout=7 * 60)
+        # Memoiza las llamadas de cada turno, ejecuta varias a la vez con callTools y mide su latencia
+        self.tool_runtime = ToolRuntime()
         if not tools:
-            self.tools = [
-                FunctionTool.from_defaults(fn=rag_tools.recommendSimilarBooks),
-                FunctionTool.from_defaults(fn=rag_tools.recommendSameGenreAs),
-                FunctionTool.from_defaults(fn=rag_tools.recommendSameAuthorAs),
-                FunctionTool.from_defaults(fn=rag_tools.getBookDescription),
-                FunctionTool.from_defaults(fn=rag_tools.getBooksInfo),
-                FunctionTool.from_defaults(fn=rag_tools.getBookReviews),
-                FunctionTool.from_defaults(fn=rag_tools.recommendBooksByReviews),
-                FunctionTool.from_defaults(fn=rag_tools.getBooksFromAuthor),
-                FunctionTool.from_defaults(fn=rag_tools.getBookAuthor),
-                FunctionTool.from_defaults(fn=rag_tools.getBookPublisher),
-                FunctionTool.from_defaults(fn=rag_tools.getBookGenre),
-            ]
+            self.tools = self.tool_runtime.tools([
+                rag_tools.recommendSimilarBooks,
+                rag_tools.recommendSameGenreAs,
+                rag_tools.recommendSameAuthorAs,
+                rag_tools.getBookDescription,
+                rag_tools.getBookCards,
+                rag_tools.getBookReviews,
+                rag_tools.recommendBooksByReviews,
+                rag_tools.getBooksFromAuthor,
+                rag_tools.getBookAuthor,
+                rag_tools.getBookPublisher,
+                rag_tools.getBookGenre,
+            ])
         else:
             self.tools = tools
+        # Precargar los metadatos de los libros más valorados (METADATA_CACHE_WARM)
+        warm = EnvLoader().metadata_cache_warm
+        if warm:
+            rag_tools.book_cache.warm(warm)
         # Crear agente y ejecutor
-        self.agent = ReActAgent.from_tools(self.tools, llm=self.llm, verbose=True, max_iterations=30)  # type: ignore
+        self.agent = self.create_chat()
 
-    def send_msg(self, message: str):
-        # Generar respuesta del agente
-        response = self.agent.chat(message)
+    def create_chat(self) -> ReActAgent:
+        """
+        Creates a conversation: an agent with its own memory that shares the LLM client and the tools of this
+        RagAgent, so that each user session keeps its history without rebuilding them.
+        """
+        memory = ChatMemoryBuffer.from_defaults(llm=self.llm)
+        return ReActAgent.from_tools(self.tools, llm=self.llm, memory=memory, verbose=True, max_iterations=30)  # type: ignore
+
+    def send_msg(self, message: str, chat: Optional[ReActAgent] = None):
+        # Generar respuesta del agente, en la conversación indicada o en la del propio RagAgent
+        agent = chat or self.agent
+        with self.tool_runtime.turn():
+            response = agent.chat(message)
         return response
+
+    def stream_msg(self, message: str, chat: Optional[ReActAgent] = None) -> Iterator[dict]:
+        """
+        Sends a message and yields the answer while the ReAct loop runs, instead of waiting for it to finish:
+        a {"type": "tool", "tool", "input", "output"} event for every tool call, as soon as it returns, then
+        {"type": "token", "text"} events with the final answer as Ollama generates it.
+
+        Args:
+            message (str): The user message.
+            chat (ReActAgent, optional): The conversation (see create_chat). Defaults to the RagAgent's own.
+        """
+        agent = chat or self.agent
+        task = agent.create_task(message)
+        reported = 0
+        # The memo is set around each step only, not across the yields to the caller
+        memo = Memo()
+        while True:
+            with self.tool_runtime.turn(memo):
+                step_output = agent.stream_step(task.task_id)
+            # Sources accumulate over the steps of the task
+            sources = step_output.output.sources
+            for source in sources[reported:]:
+                yield {"type": "tool", "tool": source.tool_name, "input": source.raw_input, "output": source.content}
+            reported = len(sources)
+            if step_output.is_last:
+                break
+
+        # The final answer is written to the conversation memory while it is consumed
+        response = agent.finalize_response(task.task_id, step_output)
+        if isinstance(response, StreamingAgentChatResponse):
+            for token in response.response_gen:
+                yield {"type": "token", "text": token}
+        else:
+            yield {"type": "token", "text": str(response)}
+
+    def tool_stats(self) -> dict[str, dict]:
+        """
+        Returns the calls, memo hits and latency of every tool (see ToolRuntime.stats).
+        """
+        return self.tool_runtime.stats()
+
+    def title_stats(self) -> dict:
+        """
+        Returns how the titles given to the tools were resolved and the agent retries saved (see TitleResolver.stats).
+        """
+        return rag_tools.title_resolver.stats()
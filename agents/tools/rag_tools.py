@@ -1,7 +1,155 @@
-from utils.db import connect
+import re
+import time
+from collections import Counter
+from utils.connection_manager import ConnectionManager
+from utils.env_loader import EnvLoader
+from utils.metadata_cache import MetadataCache, on_generation_change
+from utils.title_resolver import TitleResolver
+from models.embedding_codec import decode_embedding
 from models.embedding_manager import EmbeddingManager
+from models.vector_store import VectorStore
+
+neo4j_conn = ConnectionManager()
+
+# The Neo4j vector index of the review aggregates built by DBManager.build_review_aggregates
+REVIEW_AGGREGATE_INDEX = "ReviewAggregate_text_embedding_index"
+
+# Whether each vector index exists, as (exists, time checked), dropped when the dataset is reloaded. Indexes are
+# also created after a load, once the embeddings are generated, so entries are checked again after a while
+VECTOR_INDEX_TTL = 60.0
+vector_indexes: dict[str, tuple[bool, float]] = {}
+on_generation_change(vector_indexes.clear)
+
+# The orderings of getBookReviews, best first with DESC. Helpfulness is stored as "<helpful votes>/<votes>"
+REVIEW_ORDERS = {
+    "helpfulness": "coalesce(toInteger(split(r.helpfulness, '/')[0]), 0)",
+    "score": "coalesce(toFloat(r.score), 0.0)",
+    "recency": "coalesce(toInteger(r.time), 0)",
+}
+
+# The estimated prompt tokens of a getBookReviews answer are capped, at about 4 characters per token
+REVIEW_TOKENS_CAP = 2000
+CHARS_PER_TOKEN = 4
+MAX_REVIEWS_PER_CALL = 50
+
+# The extractive summary of getBookReviews is taken from the first SUMMARY_REVIEWS reviews of the ordering
+SUMMARY_REVIEWS = 200
+SUMMARY_REVIEW_CHARS = 2000
+SUMMARY_SENTENCES = 5
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+WORD = re.compile(r"[a-z']+")
+STOP_WORDS = frozenset(
+    "a about after all also an and any are as at be because been but by can could did do does for from had has "
+    "have he her his how i if in into is it its just me more most my no not of on one or our out so some than "
+    "that the their them then there these they this to too very was we were what when which who will with would "
+    "you your book read".split()
+)
+
+# The metadata of the books looked up by the tools, invalidated when the dataset is reloaded
+book_cache = MetadataCache(EnvLoader().metadata_cache_size)
+
+# Resolves the titles written by the LLM, often miscased or paraphrased, to the titles of the books
+title_resolver = TitleResolver()
+
+# The resolutions that are certain; the others (trigram and full-text matches) may be a different book
+CERTAIN_METHODS = ("exact", "normalized")
+
+
+def _resolve_title(title: str) -> tuple[str, str | None]:
+    """
+    Resolves a string to the title of a book (see TitleResolver.resolve).
+
+    Returns:
+        tuple[str, str | None]: The title of the book, or the string stripped if no book matches it, and a note
+                                for the agent when the match is not certain, so that it can tell the user which
+                                book the answer is about, or None.
+    """
+    resolution = title_resolver.resolve(title)
+    if resolution.title is None:
+        return title.strip(), None
+    if resolution.method in CERTAIN_METHODS:
+        return resolution.title, None
+    return resolution.title, (
+        f'There is no book titled "{title.strip()}", this is about "{resolution.title}" '
+        f'({resolution.confidence:.0%} match). Did you mean "{resolution.title}"?'
+    )
+
+
+def _vector_index_exists(index_name: str) -> bool:
+    """
+    Checks whether a vector index with the given name exists and is ready to be queried. The answer is cached for
+    VECTOR_INDEX_TTL seconds, and until the dataset generation changes.
+
+    Args:
+        index_name (str): The name of the vector index.
+
+    Returns:
+        bool: True if the index exists and is online, False otherwise.
+    """
+    cached = vector_indexes.get(index_name)
+    if cached is not None and time.monotonic() - cached[1] < VECTOR_INDEX_TTL:
+        return cached[0]
+    query = """
+    SHOW INDEXES YIELD name, type, state
+    WHERE name = $name AND type = 'VECTOR' AND state = 'ONLINE'
+    RETURN name
+    """
+    exists = neo4j_conn.read_single(query, {"name": index_name}) is not None
+    vector_indexes[index_name] = (exists, time.monotonic())
+    return exists
+
+
+def _binary_storage() -> bool:
+    """
+    Whether embeddings are stored as bytes (EMBEDDINGS_STORAGE), which the Cypher similarity functions and the
+    Neo4j vector indexes cannot read.
+    """
+    return EnvLoader().embeddings_storage != "list"
 
-neo4j_conn = connect()
+
+def _local_store_required(node_label: str, embedding_property: str) -> dict:
+    """
+    The error returned when embeddings are stored as bytes and the local vector store needed to search them
+    has not been built: Neo4j can not search binary embeddings, and scanning them would read every one over Bolt.
+    """
+    return {
+        "error": f"An error occurred: embeddings are stored as {EnvLoader().embeddings_storage} bytes and the local "
+        f"vector store of {node_label}.{embedding_property} has not been built. Build it with "
+        "DBManager.build_vector_store and set VECTOR_STORE_PATH."
+    }
+
+
+def _lookup_book_embedding(title: str, embedding_property: str) -> dict | None:
+    """
+    Resolves a title to its book and the embedding stored for it, in a single query. The embedding is read from
+    the local vector store when it has been built, so it is not shipped over Bolt.
+
+    Args:
+        title (str): The title of the book, resolved with the title resolver. Only exact and normalized matches
+                     are taken, since the input may be a description that merely resembles a title.
+        embedding_property (str): The embedding property to read, e.g. "description_embedding".
+
+    Returns:
+        dict | None: The title, description and stored embedding (None if the book has none) of the book,
+                     or None if there is no book with that title.
+    """
+    resolution = title_resolver.resolve(title, fuzzy=False)
+    if resolution.title is None:
+        return None
+    store = VectorStore.open("Book", embedding_property)
+    embedding_expr = "null" if store is not None else f"b.{embedding_property}"
+    query = f"""
+    MATCH (b:Book {{title: $title}})
+    RETURN b.title AS title, b.description AS description, {embedding_expr} AS embedding
+    """
+    result = neo4j_conn.read_single(query, {"title": resolution.title})
+    if result is None:
+        return None
+
+    embedding = store.get(result["title"]) if store is not None else decode_embedding(result["embedding"])
+    if embedding is not None:
+        embedding = embedding.tolist()
+    return {"title": result["title"], "description": result["description"], "embedding": embedding}
 
 
 def recommendSimilarBooks(
@@ -9,12 +157,17 @@ def recommendSimilarBooks(
     top_k: int = 5,
     title_embedding_property: str = "title_embedding",
     description_embedding_property: str = "description_embedding",
-) -> list:
+) -> dict:
     """
     Recommends similar books based on a given title or description.
-    If the title exists in the database, it uses the book's description for recommendations.
+    If the title exists in the database, it uses the book's description for recommendations, reusing the stored
+    description embedding instead of encoding the description again.
     If the title does not exist or the book has no description, it interprets the input as a description
     and finds books with the most similar embeddings based on title or description embeddings.
+    The search runs in-process on the local vector store when it has been built. Otherwise it runs as an
+    approximate top-k query on the Neo4j vector index of the embedding property and falls back to an exact
+    scan over every book when the index does not exist. Embeddings stored as bytes can only be searched in the
+    local vector store.
 
     Args:
         input_text (str): The title or description of the book.
@@ -23,57 +176,86 @@ def recommendSimilarBooks(
         description_embedding_property (str, optional): The property name for description embeddings.
 
     Returns:
-        list: A list of tuples, where each tuple contains the title of a similar book and the similarity score.
+        dict: A dictionary with the search path used ("local_ann", "vector_index" or "exact_scan"), whether the
+              query embedding was "stored" or "encoded", the time spent on the similarity query in milliseconds
+              and the results, a list of tuples where each tuple contains the title of a similar book and the
+              similarity score. An error instead of the results if they can not be searched.
     """
-    try:
-        with neo4j_conn.session() as session:
-            # Check if the input matches an existing book title
-            query = """
-            MATCH (b:Book {title: $title})
-            RETURN b.description AS description
-            """
-            result = session.run(query, {"title": input_text}).single()  # type: ignore
-            book_description = result["description"] if result else None
-
-            if book_description:
-                # If the book exists and has a description, generate embedding for the description
-                embedding = EmbeddingManager().generate_text_embedding(
-                    [book_description]
-                )[0]
-                embedding_property = description_embedding_property
-            else:
-                # If the book doesn't exist or has no description, generate embedding from the input text
-                embedding = EmbeddingManager().generate_text_embedding([input_text])[0]
-                embedding_property = (
-                    title_embedding_property  # Use title embedding for input
-                )
-
-            # Query for similar books
-            similar_books_query = f"""
-            MATCH (b:Book)
-            WITH b, 
-                 CASE 
-                     WHEN b.{embedding_property} IS NOT NULL THEN gds.similarity.cosine(b.{embedding_property}, $embedding)
-                     ELSE -1 
-                 END AS similarity
-            RETURN b.title AS title, similarity
-            ORDER BY similarity DESC
-            LIMIT $top_k
-            """
-            similar_books = session.run(
-                similar_books_query, {"embedding": embedding, "top_k": top_k}
-            )  # type: ignore
+    # Check if the input matches an existing book title, reusing its stored embedding when there is one
+    book = _lookup_book_embedding(input_text, description_embedding_property)
+
+    if book is not None and book["embedding"] is not None:
+        # The description embedding is already stored, the encoder is skipped
+        embedding = book["embedding"]
+        embedding_property = description_embedding_property
+        query_embedding = "stored"
+    elif book is not None and book["description"]:
+        # If the book exists and has a description, generate embedding for the description
+        embedding = EmbeddingManager().generate_text_embedding(
+            [book["description"]]
+        )[0]
+        embedding_property = description_embedding_property
+        query_embedding = "encoded"
+    else:
+        # If the book doesn't exist or has no description, generate embedding from the input text
+        embedding = EmbeddingManager().generate_text_embedding([input_text])[0]
+        embedding_property = (
+            title_embedding_property  # Use title embedding for input
+        )
+        query_embedding = "encoded"
+
+    store = VectorStore.open("Book", embedding_property)
+    if store is not None:
+        start = time.perf_counter()
+        results = store.search(embedding, top_k)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        return {"search": "local_ann", "query_embedding": query_embedding, "elapsed_ms": elapsed_ms, "results": results}
+
+    index_name = f"Book_{embedding_property}_index"
+    start = time.perf_counter()
+    if _binary_storage():
+        # Binary embeddings have no Neo4j vector index
+        return _local_store_required("Book", embedding_property)
+
+    if _vector_index_exists(index_name):
+        # Approximate top-k search on the vector index, whose score (1 + cosine) / 2 is turned back into the
+        # cosine returned by the other paths
+        search_path = "vector_index"
+        similar_books_query = """
+        CALL db.index.vector.queryNodes($index_name, $top_k, $embedding)
+        YIELD node AS b, score
+        RETURN b.title AS title, 2 * score - 1 AS similarity
+        ORDER BY similarity DESC
+        """
+    else:
+        # Exact scan over every book
+        search_path = "exact_scan"
+        similar_books_query = f"""
+        MATCH (b:Book)
+        WITH b,
+             CASE
+                 WHEN b.{embedding_property} IS NOT NULL THEN gds.similarity.cosine(b.{embedding_property}, $embedding)
+                 ELSE -1
+             END AS similarity
+        RETURN b.title AS title, similarity
+        ORDER BY similarity DESC
+        LIMIT $top_k
+        """
+    similar_books = neo4j_conn.read(
+        similar_books_query,
+        {"embedding": embedding, "top_k": top_k, "index_name": index_name},
+    )
+    results = [(record["title"], record["similarity"]) for record in similar_books]
+    elapsed_ms = (time.perf_counter() - start) * 1000
 
-            return [(record["title"], record["similarity"]) for record in similar_books]
-    finally:
-        neo4j_conn.close()
+    return {"search": search_path, "query_embedding": query_embedding, "elapsed_ms": elapsed_ms, "results": results}
 
 
 def recommendSameGenreAs(
     book_title: str,
     top_k: int = 5,
     description_embedding_property: str = "description_embedding",
-) -> list:
+) -> dict:
     """
     Recommends books of the same genre as the specified book title.
     If the book has a description embedding, it uses that to find similar books belonging to the same genre.
@@ -84,60 +266,75 @@ def recommendSameGenreAs(
         description_embedding_property (str, optional): The property name of the book node that contains
                                                         the description embedding. Defaults to "description_embedding".
     Returns:
-        list: A list of tuples, where each tuple contains the title of a similar genre book and
-              the similarity score.
+        dict: The title of the book the recommendations are for, a note if the title was not matched exactly, and
+              the results, a list of tuples where each tuple contains the title of a similar genre book and the
+              similarity score (None if the book has no description embedding). An error instead of the results if they can not be searched.
     """
-    try:
-        book_query = f"""
-        MATCH (b:Book {{title: $title}})-[:BELONGS_TO]->(g:Genre)
-        RETURN g.name AS genre, b.{description_embedding_property} AS embedding
+    book_title, note = _resolve_title(book_title)
+    answer = {"book": book_title, **({"note": note} if note else {})}
+    store = VectorStore.open("Book", description_embedding_property)
+    # With a local store the embedding is read in-process instead of being shipped over Bolt
+    embedding_expr = "null" if store is not None else f"b.{description_embedding_property}"
+    book_query = f"""
+    MATCH (b:Book {{title: $title}})-[:BELONGS_TO]->(g:Genre)
+    RETURN g.name AS genre, {embedding_expr} AS embedding
+    """
+    result = neo4j_conn.read_single(book_query, {"title": book_title})
+
+    if result is None:
+        return {**answer, "results": []}
+
+    genre = result["genre"]
+    book_embedding = store.get(book_title) if store is not None else decode_embedding(result["embedding"])
+
+    if book_embedding is not None and store is not None:
+        candidates_query = f"""
+        MATCH (b:Book)-[:BELONGS_TO]->(g:Genre {{name: $genre}})
+        WHERE b.title <> $title
+        RETURN collect(b.title) AS titles
         """
-        with neo4j_conn.session() as session:
-            result = session.run(book_query, {"title": book_title}).single()  # type: ignore
-
-            if result is None:
-                return []
-
-            genre = result["genre"]
-
-            if result["embedding"] is not None:
-                book_embedding = result["embedding"]
-                similar_books_query = f"""
-                MATCH (b:Book)-[:BELONGS_TO]->(g:Genre {{name: $genre}})
-                WITH b, 
-                     CASE 
-                         WHEN b.{description_embedding_property} IS NOT NULL THEN gds.similarity.cosine(b.{description_embedding_property}, $embedding)
-                         ELSE -1 
-                     END AS similarity
-                WHERE b.title <> $title
-                RETURN b.title AS title, similarity
-                ORDER BY similarity DESC
-                LIMIT $top_k
-                """
-                similar_books = session.run(similar_books_query, {"embedding": book_embedding, "top_k": top_k, "title": book_title, "genre": genre})  # type: ignore
-
-            else:
-                similar_books_query = f"""
-                MATCH (b:Book)-[:BELONGS_TO]->(g:Genre {{name: $genre}})
-                WHERE b.title <> $title
-                RETURN b.title AS title
-                LIMIT $top_k
-                """
-                similar_books = session.run(
-                    similar_books_query,
-                    {"top_k": top_k, "title": book_title, "genre": genre},
-                )
-
-            return [(record["title"], record["similarity"]) for record in similar_books]
-    finally:
-        neo4j_conn.close()
+        candidates = neo4j_conn.read_single(candidates_query, {"title": book_title, "genre": genre})["titles"]  # type: ignore
+        return {**answer, "results": store.rank(book_embedding, candidates, top_k)}
+
+    elif book_embedding is not None and _binary_storage():
+        return {**answer, **_local_store_required("Book", description_embedding_property)}
+
+    elif book_embedding is not None:
+        similar_books_query = f"""
+        MATCH (b:Book)-[:BELONGS_TO]->(g:Genre {{name: $genre}})
+        WITH b,
+             CASE
+                 WHEN b.{description_embedding_property} IS NOT NULL THEN gds.similarity.cosine(b.{description_embedding_property}, $embedding)
+                 ELSE -1
+             END AS similarity
+        WHERE b.title <> $title
+        RETURN b.title AS title, similarity
+        ORDER BY similarity DESC
+        LIMIT $top_k
+        """
+        similar_books = neo4j_conn.read(similar_books_query, {"embedding": book_embedding.tolist(), "top_k": top_k, "title": book_title, "genre": genre})
+
+    else:
+        # Without an embedding there is nothing to score by
+        similar_books_query = f"""
+        MATCH (b:Book)-[:BELONGS_TO]->(g:Genre {{name: $genre}})
+        WHERE b.title <> $title
+        RETURN b.title AS title, null AS similarity
+        LIMIT $top_k
+        """
+        similar_books = neo4j_conn.read(
+            similar_books_query,
+            {"top_k": top_k, "title": book_title, "genre": genre},
+        )
+
+    return {**answer, "results": [(record["title"], record["similarity"]) for record in similar_books]}
 
 
 def recommendSameAuthorAs(
     book_title: str,
     top_k: int = 5,
     description_embedding_property: str = "description_embedding",
-) -> list:
+) -> dict:
     """
     Recommends books of the same author as the specified book title.
     If the book has a description embedding, it uses that to find similar books belonging to the same author.
@@ -148,53 +345,121 @@ def recommendSameAuthorAs(
         description_embedding_property (str, optional): The property name of the book node that contains
                                                         the description embedding. Defaults to "description_embedding".
     Returns:
-        list: A list of tuples, where each tuple contains the title of a similar author book and
-              the similarity score.
+        dict: The title of the book the recommendations are for, a note if the title was not matched exactly, and
+              the results, a list of tuples where each tuple contains the title of a similar author book and the
+              similarity score (None if the book has no description embedding). An error instead of the results if they can not be searched.
     """
-    try:
-        book_query = f"""
-        MATCH (b:Book {{title: $title}})-[:WRITTEN_BY]->(a:Author)
-        RETURN a.name AS author, b.{description_embedding_property} AS embedding
+    book_title, note = _resolve_title(book_title)
+    answer = {"book": book_title, **({"note": note} if note else {})}
+    store = VectorStore.open("Book", description_embedding_property)
+    # With a local store the embedding is read in-process instead of being shipped over Bolt
+    embedding_expr = "null" if store is not None else f"b.{description_embedding_property}"
+    book_query = f"""
+    MATCH (b:Book {{title: $title}})-[:WRITTEN_BY]->(a:Author)
+    RETURN a.name AS author, {embedding_expr} AS embedding
+    """
+    result = neo4j_conn.read_single(book_query, {"title": book_title})
+
+    if result is None or result["author"] is None:
+        return {**answer, "results": []}
+
+    author = result["author"]
+    book_embedding = store.get(book_title) if store is not None else decode_embedding(result["embedding"])
+
+    if book_embedding is not None and store is not None:
+        candidates_query = f"""
+        MATCH (b:Book)-[:WRITTEN_BY]->(a:Author {{name: $author}})
+        WHERE b.title <> $title
+        RETURN collect(b.title) AS titles
+        """
+        candidates = neo4j_conn.read_single(candidates_query, {"title": book_title, "author": author})["titles"]  # type: ignore
+        return {**answer, "results": store.rank(book_embedding, candidates, top_k)}
+
+    elif book_embedding is not None and _binary_storage():
+        return {**answer, **_local_store_required("Book", description_embedding_property)}
+
+    elif book_embedding is not None:
+        similar_books_query = f"""
+        MATCH (b:Book)-[:WRITTEN_BY]->(a:Author {{name: $author}})
+        WITH b,
+             CASE
+                 WHEN b.{description_embedding_property} IS NOT NULL THEN gds.similarity.cosine(b.{description_embedding_property}, $embedding)
+                 ELSE -1
+             END AS similarity
+        WHERE b.title <> $title
+        RETURN b.title AS title, similarity
+        ORDER BY similarity DESC
+        LIMIT $top_k
         """
-        with neo4j_conn.session() as session:
-            result = session.run(book_query, {"title": book_title}).single()  # type: ignore
-
-            if result is None or result["author"] is None:
-                return []
-
-            author = result["author"]
-
-            if result["embedding"] is not None:
-                book_embedding = result["embedding"]
-                similar_books_query = f"""
-                MATCH (b:Book)-[:WRITTEN_BY]->(a:Author {{name: $author}})
-                WITH b, 
-                     CASE 
-                         WHEN b.{description_embedding_property} IS NOT NULL THEN gds.similarity.cosine(b.{description_embedding_property}, $embedding)
-                         ELSE -1 
-                     END AS similarity
-                WHERE b.title <> $title
-                RETURN b.title AS title, similarity
-                ORDER BY similarity DESC
-                LIMIT $top_k
-                """
-                similar_books = session.run(similar_books_query, {"embedding": book_embedding, "top_k": top_k, "title": book_title, "author": author})  # type: ignore
-
-            else:
-                similar_books_query = f"""
-                MATCH (b:Book)-[:WRITTEN_BY]->(a:Author {{name: $author}})
-                WHERE b.title <> $title
-                RETURN b.title AS title
-                LIMIT $top_k
-                """
-                similar_books = session.run(
-                    similar_books_query,
-                    {"top_k": top_k, "title": book_title, "author": author},
-                )
-
-            return [(record["title"], record["similarity"]) for record in similar_books]
-    finally:
-        neo4j_conn.close()
+        similar_books = neo4j_conn.read(similar_books_query, {"embedding": book_embedding.tolist(), "top_k": top_k, "title": book_title, "author": author})
+
+    else:
+        # Without an embedding there is nothing to score by
+        similar_books_query = f"""
+        MATCH (b:Book)-[:WRITTEN_BY]->(a:Author {{name: $author}})
+        WHERE b.title <> $title
+        RETURN b.title AS title, null AS similarity
+        LIMIT $top_k
+        """
+        similar_books = neo4j_conn.read(
+            similar_books_query,
+            {"top_k": top_k, "title": book_title, "author": author},
+        )
+
+    return {**answer, "results": [(record["title"], record["similarity"]) for record in similar_books]}
+
+
+def _get_book_cards(books: list[str]) -> dict[str, dict | None]:
+    """
+    Returns the card of every title, None for titles not found (see MetadataCache.get). The titles are resolved
+    with the title resolver, so the cards are keyed by the titles as given and hold the canonical ones, with a
+    note when the match is not certain.
+    """
+    resolved = {book: _resolve_title(book) for book in books}
+    records = book_cache.get([title for title, _ in resolved.values()])
+    cards = {}
+    for book, (title, note) in resolved.items():
+        cards[book] = records[title].card() if records[title] is not None else None  # type: ignore
+        if cards[book] is not None and note:
+            cards[book]["note"] = note
+    return cards
+
+
+def getBookCards(books: list[str]) -> dict[str, dict | str]:
+    """
+    Get everything known about the specified books at once: authors, genres, publishers, description,
+    published date, ratings count and image URL. Prefer it to asking for each field separately.
+
+    Parameters:
+        books (list[str]): The titles of the books.
+
+    Returns:
+        dict[str, dict | str]: The card of each book, or a message if the book is not found. A card has a note
+                               when its title is not the one asked for.
+    """
+    try:
+        return {book: card or "Book not found" for book, card in _get_book_cards(books).items()}
+    except Exception as e:
+        return {book: f"An error occurred: {str(e)}" for book in books}
+
+
+def _book_field(book: str, field: str) -> str:
+    """
+    Returns a field of the card of a book, lists joined by commas, or a message if the book is not found. The
+    note of the card, if any, goes first, so that the agent knows which book the field belongs to.
+    """
+    try:
+        card = _get_book_cards([book])[book]
+        if card is None:
+            return "Book not found"
+        value = card[field]
+        if not value:
+            value = "Not available"
+        elif isinstance(value, list):
+            value = ", ".join(value)
+        return f"{card['note']}\n{value}" if "note" in card else value
+    except Exception as e:
+        return f"An error occurred: {str(e)}"
 
 
 def getBookDescription(book: str) -> str:
@@ -207,20 +472,7 @@ def getBookDescription(book: str) -> str:
     Returns:
         str: The description of the book or a message if not found.
     """
-    try:
-        with neo4j_conn.session() as session:
-            query = """
-            MATCH (b:Book {title: $book})
-            RETURN b.description AS description
-            """
-            result = session.run(query, {"book": book}).single()
-            if result is None:
-                return "Book not found"
-            return result["description"]
-    except Exception as e:
-        return f"An error occurred: {str(e)}"
-    finally:
-        neo4j_conn.close()
+    return _book_field(book, "description")
 
 
 def getBooksInfo(books: list[str]) -> dict[str, dict]:
@@ -228,28 +480,19 @@ def getBooksInfo(books: list[str]) -> dict[str, dict]:
     Get the information of the specified books. This includes the author, genre, description,
     published date, and image URL.
     """
-    try:
-        with neo4j_conn.session() as session:
-            query = """
-                MATCH (b:Book)-[:WRITTEN_BY]->(a:Author),
-                    (b)-[:BELONGS_TO]->(g:Genre)
-                WHERE b.title IN $books
-                RETURN b.title AS title, b AS book, b.description AS description, a.name AS author, g.name AS genre, b.publishedDate AS published, b.image AS imageUrl
-            """
-            result = session.run(query, {"books": books})  # type: ignore
-            return {
-                record["title"]: {
-                    "author": record["author"],
-                    "genre": record["genre"],
-                    "description": record["description"],
-                    "published": record["book"]["published"],
-                    "imageUrl": record["imageUrl"],
-                }
-                for record in result
-            }
-    finally:
-        neo4j_conn.close()
-        
+    return {
+        book: {
+            **({"title": card["title"], "note": card["note"]} if "note" in card else {}),
+            "author": ", ".join(card["authors"]),
+            "genre": ", ".join(card["genres"]),
+            "description": card["description"],
+            "published": card["published"],
+            "imageUrl": card["imageUrl"],
+        }
+        for book, card in _get_book_cards(books).items()
+        if card is not None
+    }
+
 def getBookAuthor(book: str) -> str:
     """
     Get the author of the specified book.
@@ -260,21 +503,8 @@ def getBookAuthor(book: str) -> str:
     Returns:
         str: The author of the book or a message if not found.
     """
-    try:
-        with neo4j_conn.session() as session:
-            query = """
-            MATCH (b:Book {title: $book})-[:WRITTEN_BY]->(a:Author)
-            RETURN a.name AS author
-            """
-            result = session.run(query, {"book": book}).single()
-            if result is None:
-                return "Book not found"
-            return result["author"]
-    except Exception as e:
-        return f"An error occurred: {str(e)}"
-    finally:
-        neo4j_conn.close()
-        
+    return _book_field(book, "authors")
+
 def getBookGenre(book: str) -> str:
     """
     Get the genre of the specified book.
@@ -285,21 +515,8 @@ def getBookGenre(book: str) -> str:
     Returns:
         str: The genre of the book or a message if not found.
     """
-    try:
-        with neo4j_conn.session() as session:
-            query = """
-            MATCH (b:Book {title: $book})-[:BELONGS_TO]->(g:Genre)
-            RETURN g.name AS genre
-            """
-            result = session.run(query, {"book": book}).single()
-            if result is None:
-                return "Book not found"
-            return result["genre"]
-    except Exception as e:
-        return f"An error occurred: {str(e)}"
-    finally:
-        neo4j_conn.close()
-        
+    return _book_field(book, "genres")
+
 def getBookPublisher(book: str) -> str:
     """
     Get the publisher of the specified book.
@@ -310,79 +527,257 @@ def getBookPublisher(book: str) -> str:
     Returns:
         str: The publisher of the book or a message if not found.
     """
-    try:
-        with neo4j_conn.session() as session:
-            query = """
-            MATCH (b:Book {title: $book})-[:PUBLISHED_BY]->(p:Publisher)
-            RETURN p.name AS publisher
-            """
-            result = session.run(query, {"book": book}).single()
-            if result is None:
-                return "Book not found"
-            return result["publisher"]
-    except Exception as e:
-        return f"An error occurred: {str(e)}"
-    finally:
-        neo4j_conn.close()
+    return _book_field(book, "publishers")
 
 
-def getBookReviews(book: str) -> list[str]:
+def _summarize_reviews(texts: list[str], sentences: int) -> list[str]:
+    """
+    Extractive summary of reviews: the sentences whose words are most frequent across all the reviews, in the
+    order they were found. Sentences are scored by the mean frequency of their non stop words, so that long
+    sentences are not favoured.
     """
-    Get the reviews of the specified book.
+    candidates = []
+    for text in texts:
+        candidates += [sentence.strip() for sentence in SENTENCE_SPLIT.split(text) if len(sentence.split()) >= 5]
+    words = [[word for word in WORD.findall(sentence.lower()) if word not in STOP_WORDS] for sentence in candidates]
+    frequencies = Counter(word for sentence in words for word in sentence)
+    scores = [sum(frequencies[word] for word in sentence) / len(sentence) if sentence else 0.0 for sentence in words]
+    best = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)
+    chosen = []
+    for i in best:
+        # Reviews often repeat the same sentence
+        if candidates[i] not in (candidates[j] for j in chosen):
+            chosen.append(i)
+        if len(chosen) == sentences:
+            break
+    return [candidates[i] for i in sorted(chosen)]
+
+
+def _fit_review(review: dict, max_chars: int, budget: int) -> dict | None:
+    """
+    Shortens a review so that its summary and text together take at most max_chars characters and the review, as
+    the agent sees it, at most budget characters: the text is cut first, then the summary. Returns None if not even
+    the other fields fit.
+    """
+    review = dict(review)
+    for field, other in (("text", "summary"), ("summary", "text")):
+        value = review[field] or ""
+        keep = min(len(value), max(0, max_chars - len(review[other] or "")))
+        # The string form escapes quotes and backslashes, so the excess is measured on it until it fits
+        while keep > 0 and len(str({**review, field: value[:keep]})) > budget:
+            keep -= max(1, len(str({**review, field: value[:keep]})) - budget)
+        keep = max(0, keep)
+        if keep < len(value):
+            review[field] = value[:keep]
+            review["truncated"] = True
+    return review if len(str(review)) <= budget else None
+
+
+def getBookReviews(
+    book: str,
+    order_by: str = "helpfulness",
+    limit: int = 10,
+    cursor: int = 0,
+    max_chars: int = 500,
+    summarize: bool = False,
+) -> dict:
+    """
+    Get a page of the reviews of the specified book, the most helpful, best scored or most recent first.
+    To read more reviews, call it again with the returned next_cursor. Ask for a summary to get the main
+    opinions of many reviews at once.
 
     Parameters:
         book (str): The title of the book.
+        order_by (str, optional): "helpfulness", "score" or "recency". Defaults to "helpfulness".
+        limit (int, optional): The number of reviews in the page, at most 50. Defaults to 10.
+        cursor (int, optional): The position of the page, 0 for the first one. Defaults to 0.
+        max_chars (int, optional): The characters kept of each review. Defaults to 500.
+        summarize (bool, optional): Whether to add an extractive summary of the top reviews. Defaults to False.
 
     Returns:
-        list[str]: The reviews of the book or a message if not found.
+        dict: The title of the book, a note if it is not the one asked for, the total number of reviews, the
+              reviews of the page (score, helpfulness, time, summary and text, with whether the text was
+              truncated), the next_cursor (None on the last page) and the summary if asked. Reviews are left out when the answer would exceed REVIEW_TOKENS_CAP tokens.
     """
+    if order_by not in REVIEW_ORDERS:
+        return {"error": f"order_by must be one of {', '.join(REVIEW_ORDERS)}"}
     try:
-        with neo4j_conn.session() as session:
-            query = """
-            MATCH (r:Review)-[:REVIEWS]->(b:Book {title: $book})
-            RETURN r.text AS review
-            """
-            result = session.run(query, {"book": book})  # type: ignore
-            return [record["review"] for record in result]
+        title, note = _resolve_title(book)
+        # Ordering, paging and truncation run in the database, so only the page crosses the wire
+        query = f"""
+        MATCH (b:Book {{title: $book}})
+        CALL {{
+            WITH b
+            MATCH (r:Review)-[:REVIEWS]->(b)
+            WITH r ORDER BY {REVIEW_ORDERS[order_by]} DESC, elementId(r) SKIP $skip LIMIT $limit
+            RETURN collect({{
+                score: r.score,
+                helpfulness: r.helpfulness,
+                time: r.time,
+                summary: left(r.summary, $max_chars),
+                text: left(r.text, $max_chars),
+                truncated: size(r.text) > $max_chars
+            }}) AS reviews
+        }}
+        RETURN COUNT {{ (:Review)-[:REVIEWS]->(b) }} AS total, reviews
+        """
+        # The summary and text of a review, together, can not take more than half of the cap
+        max_chars = max(1, min(max_chars, REVIEW_TOKENS_CAP * CHARS_PER_TOKEN // 2))
+        limit = max(1, min(limit, MAX_REVIEWS_PER_CALL))
+        cursor = max(0, cursor)
+        result = neo4j_conn.read_single(query, {"book": title, "skip": cursor, "limit": limit, "max_chars": max_chars})
+        if result is None:
+            return {"error": "Book not found"}
+
+        answer = {"book": title, **({"note": note} if note else {}), "total": result["total"]}
+        # What is left for the reviews, after the other fields (next_cursor sized for the longest value)
+        budget = REVIEW_TOKENS_CAP * CHARS_PER_TOKEN - len(str({**answer, "reviews": [], "next_cursor": result["total"]}))
+        if summarize:
+            texts = neo4j_conn.read_single(
+                query, {"book": title, "skip": 0, "limit": SUMMARY_REVIEWS, "max_chars": SUMMARY_REVIEW_CHARS}
+            )["reviews"]  # type: ignore
+            summary = [sentence[:max_chars] for sentence in _summarize_reviews([review["text"] for review in texts if review["text"]], SUMMARY_SENTENCES)]
+            # The summary takes at most half of the budget
+            while len(summary) > 1 and len(str(summary)) > budget // 2:
+                summary.pop()
+            if summary and len(str(summary)) > budget // 2:
+                summary[0] = summary[0][:max(0, budget // 2 - len(str([""])))]
+            answer["summary"] = summary
+            # The key and separator of the summary count too
+            budget -= len(str({"summary": summary})) - 1
+
+        # Reviews are added while the estimated prompt tokens are under the cap; the rest go to the next page
+        reviews = []
+        for review in result["reviews"]:
+            # The size of the review as the agent sees it, the tool output being the answer as a string, plus the
+            # separator from the previous review
+            separator = 2 if reviews else 0
+            review = _fit_review(review, max_chars, budget - separator)
+            if review is None:
+                break
+            budget -= len(str(review)) + separator
+            reviews.append(review)
+        answer["reviews"] = reviews
+        next_cursor = cursor + len(reviews)
+        answer["next_cursor"] = next_cursor if next_cursor < result["total"] else None
+        return answer
     except Exception as e:
-        return [f"An error occurred: {str(e)}"]
-    finally:
-        neo4j_conn.close()
+        return {"error": f"An error occurred: {str(e)}"}
 
 
-def recommendBooksByReviews(review: str, k: int = 5) -> list:
+def _unique_titles(scored: list, k: int) -> list[tuple[str, float]]:
+    """
+    Keeps the best score of every title in a list of (title, score) pairs sorted best first.
+    """
+    unique = {}
+    for title, score in scored:
+        unique.setdefault(title, score)
+    return list(unique.items())[:k]
+
+
+def _review_candidates(embedding: list, limit: int) -> list[str] | None:
+    """
+    Finds the books whose review aggregates (the mean and exemplars precomputed by
+    DBManager.build_review_aggregates) are the nearest to the embedding.
+
+    Returns:
+        list[str] | None: Up to `limit` book titles, best first, or None if the aggregates have not been built.
+    """
+    # A book has several aggregates, so more are fetched to fill the candidate books
+    aggregates_k = limit * 4
+    store = VectorStore.open("ReviewAggregate", "text_embedding")
+    if store is not None:
+        # The store is keyed by `<title>#<n>`
+        hits = [(key.rsplit("#", 1)[0], score) for key, score in store.search(embedding, aggregates_k)]
+    elif _vector_index_exists(REVIEW_AGGREGATE_INDEX):
+        # The index score (1 + cosine) / 2 is turned back into the cosine of the local store
+        query = """
+        CALL db.index.vector.queryNodes($index_name, $k, $embedding)
+        YIELD node, score
+        RETURN node.title AS title, 2 * score - 1 AS score
+        """
+        records = neo4j_conn.read(query, {"index_name": REVIEW_AGGREGATE_INDEX, "k": aggregates_k, "embedding": embedding})
+        hits = [(record["title"], record["score"]) for record in records]
+    else:
+        return None
+    return [title for title, _ in _unique_titles(hits, limit)]
+
+
+def recommendBooksByReviews(review: str, k: int = 5) -> list | dict:
     """
     Recommends books based on the specified text, which is used to find similar reviews.
-    This method uses the Neo4j graph database to find books that have similar embeddings
-    to the specified review's embedding, which is generated using the EmbeddingManager.
+    Candidate books are first found by searching the precomputed per-book review aggregates; then only the
+    reviews of those books are compared with the text, and each book is scored by its most similar review.
+    Without aggregates, every review is compared.
     Args:
         review (str): The review for which to find similar books.
-        k (int, optional): The number of similar reviews to find. Defaults to 5.
+        k (int, optional): The number of books to return. Defaults to 5.
     Returns:
-        list: A list of tuples, where each tuple contains the title of a similar book and
-              the similarity score.
+        list | dict: A list of tuples, where each tuple contains the title of a similar book and
+                     the similarity score. Each book appears once. An {"error": ...} dict if the reviews can not
+                     be searched.
     """
-    try:
-        review_embedding = EmbeddingManager().generate_text_embedding([review])[0]
-
-        with neo4j_conn.session() as session:
-            # Consulta para encontrar los libros más similares
-            similar_books_query = f"""
+    review_embedding = EmbeddingManager().generate_text_embedding([review])[0]
+
+    candidates = _review_candidates(review_embedding, max(k * 4, 20))
+    if candidates is not None:
+        if _binary_storage():
+            review_store = VectorStore.open("Review", "text_embedding")
+            if review_store is None:
+                return _local_store_required("Review", "text_embedding")
+            # Only the ids of the candidate reviews are read, their embeddings are in the local store
+            reviews_query = """
             MATCH (r:Review)-[:REVIEWS]->(b:Book)
-            WITH b,
-                 CASE 
-                     WHEN r.text_embedding IS NOT NULL THEN gds.similarity.cosine(r.text_embedding, $embedding)
-                     ELSE -1 
-                 END AS similarity
-            RETURN b.title AS title, similarity
-            ORDER BY similarity DESC
-            LIMIT $k
+            WHERE b.title IN $titles AND r.text_embedding IS NOT NULL
+            RETURN elementId(r) AS id, b.title AS title
             """
-            similar_books = session.run(similar_books_query, {"embedding": review_embedding, "k": k})  # type: ignore
+            titles = {record["id"]: record["title"] for record in neo4j_conn.read(reviews_query, {"titles": candidates})}
+            ranked = review_store.rank(review_embedding, list(titles), len(titles))
+            return _unique_titles([(titles[node_id], score) for node_id, score in ranked], k)
+
+        rerank_query = """
+        MATCH (r:Review)-[:REVIEWS]->(b:Book)
+        WHERE b.title IN $titles AND r.text_embedding IS NOT NULL
+        WITH b, max(gds.similarity.cosine(r.text_embedding, $embedding)) AS similarity
+        RETURN b.title AS title, similarity
+        ORDER BY similarity DESC
+        LIMIT $k
+        """
+        similar_books = neo4j_conn.read(rerank_query, {"titles": candidates, "embedding": review_embedding, "k": k})
+        return [(record["title"], record["similarity"]) for record in similar_books]
+
+    store = VectorStore.open("Review", "text_embedding")
+    if store is not None:
+        # The nearest reviews are found locally, the database only resolves their books
+        hits = store.search(review_embedding, k * 4)
+        books_query = """
+        UNWIND $hits AS hit
+        MATCH (r:Review)-[:REVIEWS]->(b:Book)
+        WHERE elementId(r) = hit.id
+        RETURN b.title AS title, hit.score AS similarity
+        ORDER BY similarity DESC
+        """
+        similar_books = neo4j_conn.read(books_query, {"hits": [{"id": node_id, "score": score} for node_id, score in hits]})
+        return _unique_titles([(record["title"], record["similarity"]) for record in similar_books], k)
+
+    if _binary_storage():
+        return _local_store_required("Review", "text_embedding")
+
+    # Consulta para encontrar los libros más similares
+    similar_books_query = f"""
+    MATCH (r:Review)-[:REVIEWS]->(b:Book)
+    WITH b,
+         max(CASE
+             WHEN r.text_embedding IS NOT NULL THEN gds.similarity.cosine(r.text_embedding, $embedding)
+             ELSE -1
+         END) AS similarity
+    RETURN b.title AS title, similarity
+    ORDER BY similarity DESC
+    LIMIT $k
+    """
+    similar_books = neo4j_conn.read(similar_books_query, {"embedding": review_embedding, "k": k})
 
-            return [(record["title"], record["similarity"]) for record in similar_books]
-    finally:
-        neo4j_conn.close()
+    return [(record["title"], record["similarity"]) for record in similar_books]
 
 
 def getBooksFromAuthor(author: str, k: int|None = None) -> list:
@@ -397,18 +792,15 @@ def getBooksFromAuthor(author: str, k: int|None = None) -> list:
         list: A list of books written by the author or a message if not found.
     """
     try:
-        with neo4j_conn.session() as session:
-            query = """
-            MATCH (b:Book)-[:WRITTEN_BY]->(a:Author {name: $author})
-            RETURN b.title AS title
-            """
-            if k is not None:
-                query += " LIMIT $k"
-            result = session.run(query, {"author": author, "k": k})  # type: ignore
-            return [record["title"] for record in result]
+        query = """
+        MATCH (b:Book)-[:WRITTEN_BY]->(a:Author {name: $author})
+        RETURN b.title AS title
+        """
+        if k is not None:
+            query += " LIMIT $k"
+        result = neo4j_conn.read(query, {"author": author, "k": k})
+        return [record["title"] for record in result]
     except Exception as e:
         return [f"An error occurred: {str(e)}"]
-    finally:
-        neo4j_conn.close()
-        
+
 # TODO: author and taking into account reviews.
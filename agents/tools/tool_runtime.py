@@ -0,0 +1,220 @@
+import contextvars
+import functools
+import inspect
+import json
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable
+from llama_index.core.tools import FunctionTool
+from utils.metadata_cache import on_generation_change
+
+# The results memoized in a turn, at most
+MEMO_SIZE = 256
+
+# The prefix of the messages returned by the tools when a query fails
+ERROR_PREFIX = "An error occurred"
+
+_MISSING = object()
+
+
+class Memo:
+    """
+    The tool results memoized in a turn: a bounded map from tool and arguments to result, oldest dropped first.
+    """
+
+    def __init__(self, max_size: int = MEMO_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str):
+        with self.lock:
+            return self.entries.get(key, _MISSING)
+
+    def put(self, key: str, result):
+        with self.lock:
+            self.entries[key] = result
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+# The memo of the turn being answered, set by ToolRuntime.turn
+_memo: contextvars.ContextVar[Memo | None] = contextvars.ContextVar("tool_memo", default=None)
+
+
+def is_error(result) -> bool:
+    """
+    Whether a tool result is, or holds, an error message: the tools catch their exceptions and return them as
+    "An error occurred: ..." strings or {"error": ...} dicts.
+    """
+    if isinstance(result, str):
+        return result.startswith(ERROR_PREFIX)
+    if isinstance(result, dict):
+        return "error" in result or any(map(is_error, result.values()))
+    if isinstance(result, (list, tuple)):
+        return any(map(is_error, result))
+    return False
+
+
+class ToolRuntime:
+    """
+    ToolRuntime wraps the functions given to the agent as tools:
+
+    - Results are memoized per turn, keyed by tool and arguments, so that a call repeated in a later iteration
+      of the ReAct loop does not query Neo4j again. Errors are not memoized, the memo is bounded (MEMO_SIZE) and
+      it is dropped when MetadataCache or TitleResolver find that the dataset has been reloaded.
+    - `callTools` runs several independent calls concurrently on a thread pool, so that the agent can get e.g.
+      the author, genre and publisher of a book in a single iteration instead of three.
+    - The latency of every tool is recorded (see stats).
+
+    Methods:
+        tool(fn: Callable):
+
+        tools(functions: list[Callable]):
+
+        turn(memo: Memo | None = None):
+
+        callTools(calls: list[dict]):
+
+        stats():
+    """
+
+    def __init__(self, workers: int = 4):
+        """
+        Args:
+            workers (int, optional): The threads that run the calls of callTools. Defaults to 4.
+        """
+        self.functions: dict[str, Callable] = {}
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tool")
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict] = {}
+        self._memos = weakref.WeakSet()
+        on_generation_change(self.invalidate)
+
+    def tool(self, fn: Callable) -> FunctionTool:
+        """
+        Returns the FunctionTool of a function, memoized and timed. Its name, docstring and signature are those of
+        the function.
+        """
+        self.functions[fn.__name__] = fn
+
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            return self._call(fn.__name__, args, kwargs)
+
+        return FunctionTool.from_defaults(fn=call)
+
+    def tools(self, functions: list[Callable]) -> list[FunctionTool]:
+        """
+        Returns the tools of the functions, followed by callTools to run several of them at once.
+        """
+        tools = [self.tool(fn) for fn in functions]
+        return tools + [FunctionTool.from_defaults(fn=self.callTools)]
+
+    @contextmanager
+    def turn(self, memo: Memo | None = None):
+        """
+        Memoizes the tool calls made inside the block, including those of callTools. A turn that spans several
+        blocks passes the same memo to each of them.
+        """
+        if memo is None:
+            memo = Memo()
+        self._memos.add(memo)
+        token = _memo.set(memo)
+        try:
+            yield memo
+        finally:
+            _memo.reset(token)
+
+    def invalidate(self):
+        """
+        Drops the results memoized by the turns in progress.
+        """
+        for memo in list(self._memos):
+            memo.clear()
+
+    def _key(self, name: str, args: tuple, kwargs: dict) -> str:
+        arguments = inspect.signature(self.functions[name]).bind(*args, **kwargs)
+        arguments.apply_defaults()
+        return json.dumps([name, arguments.arguments], sort_keys=True, default=str)
+
+    def _call(self, name: str, args: tuple, kwargs: dict):
+        memo = _memo.get()
+        key = self._key(name, args, kwargs) if memo is not None else None
+        if key is not None:
+            result = memo.get(key)  # type: ignore
+            if result is not _MISSING:
+                self._record(name, 0.0, hit=True)
+                return result
+
+        start = time.perf_counter()
+        try:
+            result = self.functions[name](*args, **kwargs)
+        finally:
+            self._record(name, time.perf_counter() - start, hit=False)
+        # A failure may be transient, so it is run again next time
+        if key is not None and not is_error(result):
+            memo.put(key, result)  # type: ignore
+        return result
+
+    def _record(self, name: str, seconds: float, hit: bool):
+        with self._lock:
+            stats = self._stats.setdefault(name, {"calls": 0, "hits": 0, "seconds": 0.0, "max_seconds": 0.0})
+            stats["calls"] += 1
+            if hit:
+                stats["hits"] += 1
+            else:
+                stats["seconds"] += seconds
+                stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+    def callTools(self, calls: list[dict]) -> list[dict]:
+        """
+        Run several independent tool calls at the same time. Use it instead of calling tools one by one when you
+        need several pieces of information that do not depend on each other, e.g. the author, genre and publisher
+        of a book, or the description of several books.
+
+        Parameters:
+            calls (list[dict]): The calls, each one {"tool": <tool name>, "args": {<parameter>: <value>}},
+                                e.g. [{"tool": "getBookAuthor", "args": {"book": "Dune"}}].
+
+        Returns:
+            list[dict]: The result of each call, in the same order, as {"tool", "args", "result"}.
+        """
+
+        def run(call: dict):
+            name = call.get("tool")
+            if name not in self.functions:
+                return f"Unknown tool: {name}"
+            try:
+                return self._call(name, (), call.get("args") or {})
+            except Exception as e:
+                return f"An error occurred: {str(e)}"
+
+        # Every call runs in a copy of the current context, so that it uses the memo of the turn
+        futures = [self.executor.submit(contextvars.copy_context().run, run, call) for call in calls]
+        return [
+            {"tool": call.get("tool"), "args": call.get("args"), "result": future.result()}
+            for call, future in zip(calls, futures)
+        ]
+
+    def stats(self) -> dict[str, dict]:
+        """
+        Returns, per tool, the calls, the calls answered from a memo, the seconds spent running it and the mean
+        and maximum seconds of the calls that ran.
+        """
+        with self._lock:
+            return {
+                name: {
+                    **stats,
+                    "mean_seconds": stats["seconds"] / (stats["calls"] - stats["hits"]) if stats["calls"] > stats["hits"] else 0.0,
+                }
+                for name, stats in self._stats.items()
+            }
@@ -0,0 +1,133 @@
+import os
+from transformers import AutoModel
+import torch
+
+BACKENDS = ("torch", "torch-int8", "onnx")
+
+
+def artifact_dir(artifacts_path: str, model_name: str) -> str:
+    """
+    Returns the directory of the optimized artifacts of a model.
+    """
+    return os.path.join(artifacts_path, model_name.replace("/", "__"))
+
+
+class TorchBackend:
+    """
+    Full-precision Hugging Face model, the reference backend.
+    """
+
+    def __init__(self, model_name: str, device: torch.device):
+        self.device = device
+        self.model = AutoModel.from_pretrained(model_name).to(device)
+        self.model.eval()
+
+    def forward(self, inputs: dict) -> torch.Tensor:
+        """
+        Runs the model and returns its last hidden state.
+        """
+        with torch.no_grad():
+            return self.model(**inputs).last_hidden_state
+
+
+class QuantizedTorchBackend(TorchBackend):
+    """
+    Model with its linear layers dynamically quantized to int8, for CPU inference. The quantized model is cached
+    as `int8.pt` in the artifacts directory and reused on the next load.
+    """
+
+    def __init__(self, model_name: str, device: torch.device, artifacts_path: str):
+        self.device = torch.device("cpu")
+        path = os.path.join(artifact_dir(artifacts_path, model_name), "int8.pt")
+        if os.path.exists(path):
+            self.model = torch.load(path, weights_only=False)
+        else:
+            self.model = self.export(model_name, path)
+        self.model.eval()
+
+    @staticmethod
+    def export(model_name: str, path: str) -> torch.nn.Module:
+        """
+        Quantizes the model and saves it to the given path.
+        """
+        model = AutoModel.from_pretrained(model_name)
+        model.eval()
+        quantized = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        torch.save(quantized, path)
+        return quantized
+
+
+class OnnxBackend:
+    """
+    Model exported to ONNX and run with ONNX Runtime on CPU with every graph optimization enabled. The export is
+    cached as `model.onnx` in the artifacts directory; run utils/export-embeddings-model.py to produce it.
+    """
+
+    def __init__(self, model_name: str, device: torch.device, artifacts_path: str):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError("The onnx embeddings backend requires the onnxruntime package") from e
+
+        self.device = torch.device("cpu")
+        path = os.path.join(artifact_dir(artifacts_path, model_name), "model.onnx")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} does not exist, export it with utils/export-embeddings-model.py onnx")
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    @staticmethod
+    def export(model_name: str, path: str, tokenizer):
+        """
+        Exports the model to ONNX with dynamic batch and sequence axes.
+        """
+        model = AutoModel.from_pretrained(model_name)
+        model.eval()
+        sample = tokenizer(["librerIA"], return_tensors="pt")
+        input_names = list(sample.keys())
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (dict(sample),),
+                path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes={
+                    **{name: {0: "batch", 1: "sequence"} for name in input_names},
+                    "last_hidden_state": {0: "batch", 1: "sequence"},
+                },
+                opset_version=17,
+            )
+
+    def forward(self, inputs: dict) -> torch.Tensor:
+        """
+        Runs the model and returns its last hidden state.
+        """
+        feed = {name: tensor.cpu().numpy() for name, tensor in inputs.items() if name in self.input_names}
+        return torch.from_numpy(self.session.run(["last_hidden_state"], feed)[0])
+
+
+def load_backend(backend: str, model_name: str, device: torch.device, artifacts_path: str):
+    """
+    Loads the inference backend of the embeddings model.
+
+    Args:
+        backend (str): "torch" (fp32), "torch-int8" (dynamic int8 quantization) or "onnx" (ONNX Runtime).
+        model_name (str): The Hugging Face model.
+        device (torch.device): The device of the torch backend; the other backends run on CPU.
+        artifacts_path (str): The directory of the optimized artifacts.
+
+    Returns:
+        The backend, whose `forward(inputs)` returns the last hidden state of the model.
+    """
+    if backend == "torch":
+        return TorchBackend(model_name, device)
+    if backend == "torch-int8":
+        return QuantizedTorchBackend(model_name, device, artifacts_path)
+    if backend == "onnx":
+        return OnnxBackend(model_name, device, artifacts_path)
+    raise ValueError(f"Unknown embeddings backend {backend}, expected one of {', '.join(BACKENDS)}")
@@ -0,0 +1,176 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+
+PURGE_INTERVAL = 1000
+
+
+class EmbeddingCache:
+    """
+    EmbeddingCache is a bounded LRU cache of text embeddings with a time to live, keyed by model name and
+    normalized text, so that repeated strings skip the encoder.
+
+    An optional on-disk tier (a SQLite file holding the embeddings as float32 blobs) survives restarts. Entries
+    found there are promoted to the in-memory tier. Expired rows are deleted and the oldest rows trimmed to
+    `disk_max_size` when the file is opened and every `PURGE_INTERVAL` writes.
+
+    Methods:
+        get(model_name: str, text: str):
+
+        put(model_name: str, text: str, embedding: np.ndarray):
+
+        stats():
+
+        clear():
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 3600, disk_path: str = "", disk_max_size: int = 100000):
+        """
+        Args:
+            max_size (int, optional): The maximum number of entries kept in memory. Defaults to 10000.
+            ttl (float, optional): The age in seconds after which an entry expires, 0 to never expire. Defaults to 3600.
+            disk_path (str, optional): The SQLite file of the on-disk tier, empty to disable it. Defaults to "".
+            disk_max_size (int, optional): The maximum number of rows kept on disk, 0 for no limit. Defaults to 100000.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_max_size = disk_max_size
+        self._disk = None
+        self._writes = 0
+        if disk_path:
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    embedding BLOB NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )
+                """
+            )
+            self._disk.execute("CREATE INDEX IF NOT EXISTS embeddings_created ON embeddings (created)")
+            self._purge()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """
+        Normalizes a text for caching: surrounding whitespace is removed and inner whitespace collapsed.
+        """
+        return " ".join(text.split())
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl > 0 and time.time() - created > self.ttl
+
+    def get(self, model_name: str, text: str) -> np.ndarray | None:
+        """
+        Returns the cached embedding of a text for a model, or None if it is not cached or has expired.
+        """
+        key = (model_name, self.normalize(text))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+            if self._disk is not None:
+                row = self._disk.execute(
+                    "SELECT created, embedding FROM embeddings WHERE model = ? AND text_hash = ?",
+                    (model_name, self._hash(key[1])),
+                ).fetchone()
+                if row is not None and not self._expired(row[0]):
+                    embedding = np.frombuffer(row[1], dtype=np.float32)
+                    self._store(key, row[0], embedding)
+                    self.disk_hits += 1
+                    return embedding
+
+            self.misses += 1
+            return None
+
+    def put(self, model_name: str, text: str, embedding: np.ndarray):
+        """
+        Caches the embedding of a text for a model, in memory and, if enabled, on disk.
+        """
+        key = (model_name, self.normalize(text))
+        created = time.time()
+        # A copy, so that a row does not keep the whole batch it was sliced from alive
+        embedding = np.array(embedding, dtype=np.float32)
+        with self._lock:
+            self._store(key, created, embedding)
+            if self._disk is not None:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, created, embedding) VALUES (?, ?, ?, ?)",
+                    (model_name, self._hash(key[1]), created, embedding.tobytes()),
+                )
+                self._writes += 1
+                if self._writes % PURGE_INTERVAL == 0:
+                    self._purge()
+                else:
+                    self._disk.commit()
+
+    def _purge(self):
+        """
+        Deletes the expired rows of the on-disk tier and then the oldest ones over `disk_max_size`.
+        """
+        if self.ttl > 0:
+            self._disk.execute("DELETE FROM embeddings WHERE created < ?", (time.time() - self.ttl,))
+        if self.disk_max_size > 0:
+            self._disk.execute(
+                """
+                DELETE FROM embeddings WHERE rowid IN (
+                    SELECT rowid FROM embeddings ORDER BY created DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.disk_max_size,),
+            )
+        self._disk.commit()
+
+    def _store(self, key: tuple, created: float, embedding: np.ndarray):
+        self._entries[key] = (created, embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def stats(self) -> dict:
+        """
+        Returns the size of the cache and its hit, disk hit, miss and eviction counters.
+        """
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        """
+        Empties the in-memory tier and the on-disk tier.
+        """
+        with self._lock:
+            self._entries.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM embeddings")
+                self._disk.commit()
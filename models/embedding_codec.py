@@ -0,0 +1,54 @@
+import numpy as np
+
+STORAGES = ("list", "float32", "int8")
+
+# The first byte of a binary embedding tells its format
+FLOAT32_TAG = b"f"
+INT8_TAG = b"q"
+
+
+def encode_embedding(embedding, storage: str = "list"):
+    """
+    Encodes an embedding for storage in a node property.
+
+    Args:
+        embedding: The embedding, a list of floats or a NumPy array.
+        storage (str, optional): "list" for a Cypher list of floats, "float32" for packed little-endian float32
+                                 bytes, or "int8" for bytes quantized to int8 with a float32 scale. Defaults to "list".
+
+    Returns:
+        list | bytes: The value to store.
+    """
+    if storage == "list":
+        return list(map(float, embedding))
+    vector = np.asarray(embedding, dtype="<f4")
+    if storage == "float32":
+        return FLOAT32_TAG + vector.tobytes()
+    if storage == "int8":
+        scale = float(np.abs(vector).max()) / 127 or 1.0
+        quantized = np.clip(np.round(vector / scale), -127, 127).astype(np.int8)
+        return INT8_TAG + np.float32(scale).astype("<f4").tobytes() + quantized.tobytes()
+    raise ValueError(f"Unknown embeddings storage {storage}, expected one of {', '.join(STORAGES)}")
+
+
+def decode_embedding(value) -> np.ndarray | None:
+    """
+    Decodes an embedding read from a node property, whatever its storage format.
+
+    Args:
+        value: The property value: a list of floats, binary float32 or binary int8, or None.
+
+    Returns:
+        np.ndarray | None: The float32 embedding, or None if the value is None.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray)):
+        value = bytes(value)
+        if value[:1] == FLOAT32_TAG:
+            return np.frombuffer(value, dtype="<f4", offset=1).astype(np.float32)
+        if value[:1] == INT8_TAG:
+            scale = np.frombuffer(value, dtype="<f4", count=1, offset=1)[0]
+            return np.frombuffer(value, dtype=np.int8, offset=5).astype(np.float32) * scale
+        raise ValueError("Unknown binary embedding format")
+    return np.asarray(value, dtype=np.float32)
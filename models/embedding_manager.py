@@ -1,10 +1,18 @@
-from transformers import AutoModel, AutoTokenizer
+import time
+from typing import Callable, Optional
+from transformers import AutoTokenizer
+from models.embedding_backends import load_backend
+from models.embedding_cache import EmbeddingCache
+from models.embedding_workers import EmbeddingWorkerPool
 from utils.env_loader import EnvLoader as Env
+import numpy as np
 import torch
 
 
 class EmbeddingManager:
     _instance = None
+    # Set in the processes of an EmbeddingWorkerPool, which encode in-process
+    worker_process = False
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
@@ -17,6 +25,17 @@ class EmbeddingManager:
             self.graph = None
             self.tokenizer = None
             self.model = None
+            self.model_name = None
+            self.backend = None
+            env = Env()
+            self.max_length = env.embeddings_max_tokens
+            self.cache = EmbeddingCache(
+                max_size=env.embeddings_cache_size,
+                ttl=env.embeddings_cache_ttl,
+                disk_path=env.embeddings_cache_path,
+                disk_max_size=env.embeddings_cache_disk_size,
+            )
+            self.workers = None if self.worker_process else EmbeddingWorkerPool.shared()
             self.initialized = True
 
             self._load_tokenizer()
@@ -27,16 +46,161 @@ class EmbeddingManager:
         if self.model is not None:
             del self.model
 
-        model_name = Env().embeddings_model
+        env = Env()
+        model_name = env.embeddings_model
+        self.model_name = model_name
+        self.backend = env.embeddings_backend
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModel.from_pretrained(model_name).to(self.device)
+        # With worker processes the model only lives in the workers
+        if self.workers is None:
+            # EMBEDDINGS_BACKEND selects fp32 torch, int8 quantized torch or ONNX Runtime
+            self.model = load_backend(env.embeddings_backend, model_name, self.device, env.embeddings_artifacts_path)
 
-    def generate_text_embedding(self, texts: list):
+    def encode(
+        self,
+        texts: list,
+        max_length: Optional[int] = None,
+        normalize: bool = False,
+        dtype=np.float32,
+        use_cache: bool = True,
+    ) -> np.ndarray:
+        """
+        Generates the embeddings of the given texts as a contiguous NumPy array. Hidden states are averaged over
+        the real tokens only (attention mask), so a text gets the same vector whatever batch it is encoded in.
+        Texts already in the cache are not encoded again.
+
+        Args:
+            texts (list): The texts to encode.
+            max_length (int, optional): The token cap; longer texts are truncated. Defaults to EMBEDDINGS_MAX_TOKENS.
+            normalize (bool, optional): Whether to L2-normalize the vectors. Defaults to False.
+            dtype (optional): The dtype of the array, np.float32 or np.float16. Defaults to np.float32.
+            use_cache (bool, optional): Whether to read and fill the embedding cache. Bulk backfills should
+                                        disable it so they don't evict the query embeddings. Defaults to True.
+
+        Returns:
+            np.ndarray: A (len(texts), dimensions) array with the embedding of each text.
+        """
+        max_length = max_length or self.max_length
+        if not use_cache:
+            embeddings = self._dispatch(texts, max_length)
+        else:
+            # Backends, quantized ones included, do not give exactly the same vectors, so each one has its own entries
+            cache_key = f"{self.model_name}:{self.backend}:{max_length}"
+            cached = [self.cache.get(cache_key, text) for text in texts]
+            missing = [i for i, embedding in enumerate(cached) if embedding is None]
+            if missing:
+                computed = self._dispatch([texts[i] for i in missing], max_length)
+                for i, embedding in zip(missing, computed):
+                    cached[i] = embedding
+                    self.cache.put(cache_key, texts[i], embedding)
+            embeddings = np.stack(cached) if cached else np.empty((0, 0), dtype=np.float32)  # type: ignore
+
+        if normalize and len(embeddings):
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.where(norms == 0, 1, norms)
+        return np.ascontiguousarray(embeddings, dtype=dtype)
+
+    def generate_text_embedding(self, texts: list, use_cache: bool = True):
+        """
+        Generates the embeddings of the given texts as lists of floats. Kept for compatibility, see `encode`.
+
+        Args:
+            texts (list): The texts to encode.
+            use_cache (bool, optional): Whether to read and fill the embedding cache. Defaults to True.
+
+        Returns:
+            list: The embedding of each text, as a list of floats.
+        """
+        return self.encode(texts, use_cache=use_cache).tolist()
+
+    def generate_bulk_embeddings(
+        self,
+        texts: list,
+        max_batch_tokens: Optional[int] = None,
+        max_batch_size: int = 256,
+        on_batch: Optional[Callable[[int], None]] = None,
+        workers: Optional[EmbeddingWorkerPool] = None,
+    ) -> tuple[np.ndarray, dict]:
+        """
+        Generates the embeddings of many texts with as little padding as possible. The texts are sorted by
+        token length and grouped into batches whose padded size (rows times longest text) stays under a token
+        budget, instead of a fixed number of rows. The embeddings are returned in the original order.
+        With a worker pool the batches are spread across its processes.
+
+        Args:
+            texts (list): The texts to encode.
+            max_batch_tokens (int, optional): The token budget of a batch, including padding.
+                                              Defaults to EMBEDDINGS_BATCH_TOKENS.
+            max_batch_size (int, optional): The maximum number of texts in a batch. Defaults to 256.
+            on_batch (Callable[[int], None], optional): Called with the number of texts of each encoded batch,
+                                                        e.g. to update a progress bar.
+            workers (EmbeddingWorkerPool, optional): The pool that encodes the batches. Defaults to the shared pool
+                                                     configured by EMBEDDINGS_WORKERS, if any.
+
+        Returns:
+            tuple[np.ndarray, dict]: The float32 embedding of each text and the run statistics: number of texts and batches,
+                               real and padded tokens, padding waste, tokens per second and seconds spent.
+        """
+        max_batch_tokens = max_batch_tokens or Env().embeddings_batch_tokens
+        lengths = [len(ids) for ids in self.tokenizer(texts, truncation=True, max_length=self.max_length)["input_ids"]]  # type: ignore
+        order = sorted(range(len(texts)), key=lengths.__getitem__)
+
+        workers = workers or self.workers
+        batches_order = list(self._token_budget_batches(order, lengths, max_batch_tokens, max_batch_size))
+        batches_texts = ([texts[i] for i in batch] for batch in batches_order)
+        start = time.perf_counter()
+        results = workers.imap(batches_texts) if workers is not None else map(self._encode, batches_texts)
+
+        embeddings = None
+        batches = real_tokens = padded_tokens = 0
+        for batch, batch_embeddings in zip(batches_order, results):
+            if embeddings is None:
+                embeddings = np.empty((len(texts), batch_embeddings.shape[1]), dtype=np.float32)
+            embeddings[batch] = batch_embeddings
+            batches += 1
+            real_tokens += sum(lengths[i] for i in batch)
+            # Sorted ascending, so the last text is the longest one and sets the padded length
+            padded_tokens += lengths[batch[-1]] * len(batch)
+            if on_batch is not None:
+                on_batch(len(batch))
+        elapsed = time.perf_counter() - start
+
+        stats = {
+            "texts": len(texts),
+            "batches": batches,
+            "tokens": real_tokens,
+            "padded_tokens": padded_tokens,
+            "padding_waste": 1 - real_tokens / padded_tokens if padded_tokens else 0.0,
+            "tokens_per_second": real_tokens / elapsed if elapsed > 0 else 0.0,
+            "seconds": elapsed,
+        }
+        return embeddings if embeddings is not None else np.empty((0, 0), dtype=np.float32), stats
+
+    @staticmethod
+    def _token_budget_batches(order: list, lengths: list, max_batch_tokens: int, max_batch_size: int):
+        batch = []
+        for i in order:
+            # The new text is the longest so far, so it sets the padded length of the batch
+            if batch and ((len(batch) + 1) * lengths[i] > max_batch_tokens or len(batch) >= max_batch_size):
+                yield batch
+                batch = []
+            batch.append(i)
+        if batch:
+            yield batch
+
+    def _dispatch(self, texts: list, max_length: Optional[int] = None) -> np.ndarray:
+        if self.workers is not None:
+            return self.workers.encode(texts, max_length)
+        return self._encode(texts, max_length)
+
+    def _encode(self, texts: list, max_length: Optional[int] = None) -> np.ndarray:
         inputs = self.tokenizer(
-            texts, return_tensors="pt", padding=True, truncation=True
+            texts, return_tensors="pt", padding=True, truncation=True, max_length=max_length or self.max_length
         )  # type: ignore
-        inputs = {key: val.to(self.device) for key, val in inputs.items()}
+        inputs = {key: val.to(self.model.device) for key, val in inputs.items()}  # type: ignore
         with torch.no_grad():
-            outputs = self.model(**inputs)  # type: ignore
-            embeddings = outputs.last_hidden_state.mean(dim=1)
-        return embeddings.cpu().numpy().tolist()
+            hidden_state = self.model.forward(inputs)  # type: ignore
+            # Mean over the real tokens only, padding is masked out
+            mask = inputs["attention_mask"].unsqueeze(-1).to(hidden_state.dtype)
+            embeddings = (hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+        return embeddings.float().cpu().numpy()
@@ -0,0 +1,88 @@
+import os
+import multiprocessing as mp
+import torch
+from utils.env_loader import EnvLoader
+
+# The EmbeddingManager of a worker process
+_manager = None
+
+
+def _init_worker(threads: int):
+    global _manager
+    torch.set_num_threads(threads)
+    # Imported here to avoid the circular import with models.embedding_manager
+    from models.embedding_manager import EmbeddingManager
+
+    EmbeddingManager.worker_process = True
+    _manager = EmbeddingManager()
+
+
+def _encode(texts: list, max_length: int | None = None):
+    return _manager._encode(texts, max_length)  # type: ignore
+
+
+class EmbeddingWorkerPool:
+    """
+    EmbeddingWorkerPool spreads embedding batches across several processes, each one holding its own copy of the
+    model and pinned to a fixed number of torch threads. On CPU-only hosts this scales better than torch intra-op
+    threading, which stops paying off past a few cores for small batches.
+
+    Processes are started with "spawn", so they never inherit a forked torch thread pool. Every worker loads the
+    model, so memory grows with the number of workers.
+
+    Methods:
+        shared():
+
+        encode(texts: list):
+
+        imap(batches):
+
+        close():
+    """
+
+    _shared = None
+
+    def __init__(self, workers: int, threads_per_worker: int | None = None):
+        """
+        Args:
+            workers (int): The number of worker processes.
+            threads_per_worker (int, optional): The torch threads of each worker. Defaults to the number of cores
+                                                divided by the number of workers.
+        """
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        self.pool = mp.get_context("spawn").Pool(
+            workers, initializer=_init_worker, initargs=(self.threads_per_worker,)
+        )
+
+    @classmethod
+    def shared(cls) -> "EmbeddingWorkerPool | None":
+        """
+        Returns the process-wide pool configured by EMBEDDINGS_WORKERS and EMBEDDINGS_WORKER_THREADS, or None if
+        EMBEDDINGS_WORKERS is 1 or less and embeddings are computed in-process.
+        """
+        env_loader = EnvLoader()
+        if env_loader.embeddings_workers <= 1:
+            return None
+        if cls._shared is None:
+            cls._shared = cls(env_loader.embeddings_workers, env_loader.embeddings_worker_threads or None)
+        return cls._shared
+
+    def encode(self, texts: list, max_length: int | None = None):
+        """
+        Encodes a batch of texts on the next free worker and returns their float32 embeddings.
+        """
+        return self.pool.apply(_encode, (texts, max_length))
+
+    def imap(self, batches):
+        """
+        Encodes the batches across the workers, yielding their embeddings in the order of the batches.
+        """
+        return self.pool.imap(_encode, batches)
+
+    def close(self):
+        """
+        Stops the worker processes.
+        """
+        self.pool.close()
+        self.pool.join()
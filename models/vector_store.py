@@ -0,0 +1,396 @@
+import json
+import os
+import numpy as np
+from utils.env_loader import EnvLoader
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for i in range(0, len(vectors), chunk_size):
+        assignments[i:i + chunk_size] = np.argmax(vectors[i:i + chunk_size] @ centroids.T, axis=1)
+    return assignments
+
+
+def _kmeans(vectors: np.ndarray, k: int, iterations: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _assign(vectors, centroids)
+        counts = np.bincount(assignments, minlength=k)
+        non_empty = counts > 0
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sums = np.add.reduceat(vectors[np.argsort(assignments, kind="stable")], starts[non_empty], axis=0)
+        # Empty clusters keep their previous centroid
+        centroids[non_empty] = sums / counts[non_empty, None]
+        centroids = _normalize(centroids)
+    return centroids
+
+
+def _save_array(path: str, name: str, array: np.ndarray):
+    # Written aside and renamed, so that readers never map a truncated file and keep the pages of the old one
+    np.save(os.path.join(path, f"{name}.tmp.npy"), array)
+    os.replace(os.path.join(path, f"{name}.tmp.npy"), os.path.join(path, f"{name}.npy"))
+
+
+def _save_meta(path: str, meta: dict):
+    # Replaced last, it is what tells readers to reload the store
+    with open(os.path.join(path, "meta.tmp.json"), "w") as file:
+        json.dump(meta, file)
+    os.replace(os.path.join(path, "meta.tmp.json"), os.path.join(path, "meta.json"))
+
+
+def summarize(vectors, exemplars: int = 3, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    Summarizes a set of embeddings by their normalized mean followed by up to `exemplars` k-means centroids, so
+    that a group of vectors with several themes is still found by a query close to any of them.
+
+    Args:
+        vectors: The embeddings to summarize.
+        exemplars (int, optional): The maximum number of k-means centroids. Groups with fewer vectors use the
+                                   vectors themselves. Defaults to 3.
+        iterations (int, optional): The number of k-means iterations. Defaults to 10.
+        seed (int, optional): The random seed of the k-means initialization. Defaults to 0.
+
+    Returns:
+        np.ndarray: The L2-normalized mean, then the exemplars, one per row.
+    """
+    vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+    mean = _normalize(vectors.mean(axis=0, keepdims=True))
+    if len(vectors) <= 1 or exemplars <= 0:
+        return mean
+    if len(vectors) <= exemplars:
+        return np.concatenate((mean, vectors))
+    return np.concatenate((mean, _kmeans(vectors, exemplars, iterations, seed)))
+
+
+class VectorStore:
+    """
+    VectorStore is a local nearest neighbour index over the embeddings of one node property, used to avoid
+    a Neo4j round trip for every similarity query.
+
+    The store lives in a directory with one file per array, all of them memory-mapped lazily so that opening a
+    store is instantaneous and several processes share the same pages:
+        - vectors.f32: The L2-normalized float32 embedding matrix, as raw rows so that new rows are appended
+          without copying the others. meta.json holds its number of rows and dimensions.
+        - ids.npy: The node id of every row, and ids_order.npy, the permutation that sorts them.
+        - centroids.npy, list_offsets.npy and list_rows.npy: An IVF index, the rows grouped by their nearest
+          k-means centroid.
+
+    Stores are updated in place with `upsert` and `remove`, and rebuilt with `build`. Every file is written aside
+    and renamed over the old one, meta.json last; `open` notices the new meta.json and reloads them, also in the
+    other processes, which meanwhile keep reading the files they mapped.
+
+    Methods:
+        open(node_label: str, embedding_property: str):
+
+        build(path: str, ids: list, vectors, nlist: int | None = None):
+
+        build_from_pages(path: str, pages, nlist: int | None = None):
+
+        search(query, top_k: int = 5, nprobe: int | None = None):
+
+        rank(query, ids: list, top_k: int = 5):
+
+        get(node_id: str):
+
+        upsert(ids: list, vectors):
+
+        remove(ids: list):
+    """
+
+    _stores: dict = {}
+
+    def __init__(self, path: str):
+        self.path = path
+        self.mtime = os.path.getmtime(os.path.join(path, "meta.json"))
+        self.meta = None
+        self.vectors = None
+        self.ids = None
+        self.ids_order = None
+        self.centroids = None
+        self.list_offsets = None
+        self.list_rows = None
+
+    @classmethod
+    def open(cls, node_label: str, embedding_property: str) -> "VectorStore | None":
+        """
+        Returns the store of the given node label and embedding property if the local vector engine is
+        configured (VECTOR_STORE_PATH) and the store has been built, None otherwise.
+        """
+        root = EnvLoader().vector_store_path
+        if not root:
+            return None
+        path = os.path.join(root, f"{node_label}_{embedding_property}")
+        # Stores built before the vectors were kept as raw rows have to be rebuilt
+        if not os.path.exists(os.path.join(path, "meta.json")) or not os.path.exists(os.path.join(path, "vectors.f32")):
+            return None
+        store = cls._stores.get(path)
+        if store is None or store.mtime != os.path.getmtime(os.path.join(path, "meta.json")):
+            store = cls._stores[path] = cls(path)
+        return store
+
+    @classmethod
+    def build(
+        cls,
+        path: str,
+        ids: list,
+        vectors,
+        nlist: int | None = None,
+        iterations: int = 10,
+        sample_size: int = 100_000,
+        seed: int = 0,
+    ) -> "VectorStore":
+        """
+        Builds a store from the node ids and their embeddings and writes it to the given directory.
+
+        Args:
+            path (str): The directory of the store.
+            ids (list): The id of each node.
+            vectors: The embedding of each node, in the same order as the ids.
+            nlist (int, optional): The number of IVF lists. Defaults to the square root of the number of nodes.
+            iterations (int, optional): The number of k-means iterations. Defaults to 10.
+            sample_size (int, optional): The number of vectors used to train the centroids. Defaults to 100000.
+            seed (int, optional): The random seed of the k-means initialization. Defaults to 0.
+
+        Returns:
+            VectorStore: The built store.
+        """
+        return cls.build_from_pages(path, [(ids, vectors)], nlist, iterations, sample_size, seed)
+
+    @classmethod
+    def build_from_pages(
+        cls,
+        path: str,
+        pages,
+        nlist: int | None = None,
+        iterations: int = 10,
+        sample_size: int = 100_000,
+        seed: int = 0,
+    ) -> "VectorStore":
+        """
+        Builds a store like build, from pages of node ids and embeddings that are written to disk as they arrive,
+        so that memory depends on the page size and the ids, not on the embeddings of every node.
+
+        Args:
+            path (str): The directory of the store.
+            pages: An iterable of (ids, vectors) pages.
+            nlist, iterations, sample_size, seed: As in build.
+
+        Returns:
+            VectorStore: The built store.
+        """
+        os.makedirs(path, exist_ok=True)
+        # A store being rebuilt may be mapped by other processes, so nothing is overwritten until it is complete
+        raw_path = os.path.join(path, "vectors.tmp.f32")
+        ids = []
+        dimensions = 0
+        with open(raw_path, "wb") as file:
+            for page_ids, page_vectors in pages:
+                page_vectors = _normalize(np.asarray(page_vectors, dtype=np.float32))
+                dimensions = page_vectors.shape[1]
+                file.write(page_vectors.tobytes())
+                ids += [str(node_id) for node_id in page_ids]
+        if not ids:
+            os.remove(raw_path)
+            raise ValueError(f"No embeddings to index in {path}")
+
+        vectors = np.memmap(raw_path, dtype=np.float32, mode="r", shape=(len(ids), dimensions))
+        return cls._index(path, ids, vectors, nlist, iterations, sample_size, seed)
+
+    @classmethod
+    def _index(cls, path: str, ids: list, vectors: np.ndarray, nlist: int | None, iterations: int, sample_size: int, seed: int) -> "VectorStore":
+        # Trains the IVF lists over the normalized vectors, already written to vectors.tmp.f32, and puts the store in place
+        ids = np.asarray([str(node_id) for node_id in ids])
+        count = len(vectors)
+        nlist = min(nlist or max(1, int(np.sqrt(count))), count)
+
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(count, size=min(sample_size, count), replace=False)]
+        centroids = _kmeans(sample, nlist, iterations, seed)
+        assignments = _assign(vectors, centroids)
+
+        dimensions = vectors.shape[1]
+        del vectors
+        os.replace(os.path.join(path, "vectors.tmp.f32"), os.path.join(path, "vectors.f32"))
+        _save_array(path, "ids", ids)
+        _save_array(path, "ids_order", np.argsort(ids, kind="stable"))
+        _save_array(path, "centroids", centroids)
+        _save_array(path, "list_offsets", np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=nlist)))))
+        _save_array(path, "list_rows", np.argsort(assignments, kind="stable"))
+        _save_meta(path, {"count": count, "dimensions": dimensions, "nlist": nlist})
+
+        cls._stores.pop(path, None)
+        return cls(path)
+
+    def _load(self):
+        if self.vectors is not None:
+            return
+        with open(os.path.join(self.path, "meta.json")) as file:
+            self.meta = json.load(file)
+        for name in ("ids", "ids_order", "centroids", "list_offsets", "list_rows"):
+            setattr(self, name, np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r"))
+        self.vectors = self._vectors("r")
+
+    def _vectors(self, mode: str) -> np.memmap:
+        # Only the rows counted in meta.json are mapped, rows appended after them are not seen until it is replaced
+        return np.memmap(
+            os.path.join(self.path, "vectors.f32"), dtype=np.float32, mode=mode,
+            shape=(self.meta["count"], self.meta["dimensions"]),  # type: ignore
+        )
+
+    def _rows_for(self, ids: list) -> tuple[np.ndarray, np.ndarray]:
+        ids = np.asarray([str(node_id) for node_id in ids])
+        positions = np.searchsorted(self.ids, ids, sorter=self.ids_order)  # type: ignore
+        rows = self.ids_order[np.clip(positions, 0, len(self.ids) - 1)]  # type: ignore
+        return rows, self.ids[rows] == ids  # type: ignore
+
+    def _top_k(self, query: np.ndarray, rows: np.ndarray, top_k: int) -> list[tuple[str, float]]:
+        if len(rows) == 0 or top_k <= 0:
+            return []
+        # Sorted rows keep the reads on the memory map sequential
+        rows = np.sort(rows)
+        scores = self.vectors[rows] @ query  # type: ignore
+        k = min(top_k, len(rows))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(str(self.ids[rows[i]]), float(scores[i])) for i in best]  # type: ignore
+
+    def _assignments(self) -> np.ndarray:
+        # The IVF list of every row, -1 for removed rows
+        assignments = np.full(len(self.ids), -1, dtype=np.int64)  # type: ignore
+        for i in range(len(self.centroids)):  # type: ignore
+            assignments[self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]]] = i  # type: ignore
+        return assignments
+
+    def _commit(self, assignments: np.ndarray):
+        valid = assignments >= 0
+        _save_array(self.path, "list_rows", np.argsort(assignments, kind="stable")[np.count_nonzero(~valid):])
+        _save_array(
+            self.path,
+            "list_offsets",
+            np.concatenate(([0], np.cumsum(np.bincount(assignments[valid], minlength=len(self.centroids))))),  # type: ignore
+        )
+        _save_meta(self.path, dict(self.meta, count=int(len(self.ids)), removed=int(np.count_nonzero(~valid))))  # type: ignore
+        self.__init__(self.path)
+
+    def __len__(self) -> int:
+        self._load()
+        return int(self.meta["count"])  # type: ignore
+
+    def get(self, node_id: str) -> np.ndarray | None:
+        """
+        Returns the normalized embedding stored for the given node id, or None if it is not in the store.
+        """
+        self._load()
+        rows, found = self._rows_for([node_id])
+        if not found[0] or not np.any(self.vectors[rows[0]]):  # type: ignore
+            return None
+        return np.array(self.vectors[rows[0]])  # type: ignore
+
+    def upsert(self, ids: list, vectors):
+        """
+        Inserts or replaces the embeddings of the given node ids. Replaced rows are overwritten in place and new
+        rows are appended to the vectors file, without copying the existing ones. Rows join the IVF list of their nearest centroid; centroids are not retrained, so
+        rebuild the store after it has grown a lot.
+
+        Args:
+            ids (list): The node ids, without duplicates.
+            vectors: The embedding of each node, in the same order as the ids.
+        """
+        if len(ids) == 0:
+            return
+        self._load()
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        rows, found = self._rows_for(ids)
+        assignments = self._assignments()
+        lists = _assign(vectors, self.centroids)  # type: ignore
+
+        if found.any():
+            stored = self._vectors("r+")
+            stored[rows[found]] = vectors[found]
+            stored.flush()
+            del stored
+            assignments[rows[found]] = lists[found]
+
+        new = ~found
+        if new.any():
+            # Written after the committed rows, dropping whatever an interrupted upsert left there; the file only
+            # grows, so the pages mapped by readers stay valid
+            with open(os.path.join(self.path, "vectors.f32"), "r+b") as file:
+                file.seek(len(self.ids) * vectors.shape[1] * vectors.itemsize)  # type: ignore
+                file.write(vectors[new].tobytes())
+                file.truncate()
+            self.ids = np.concatenate((self.ids, np.asarray([str(node_id) for node_id in ids])[new]))  # type: ignore
+            _save_array(self.path, "ids", self.ids)
+            _save_array(self.path, "ids_order", np.argsort(self.ids, kind="stable"))
+            assignments = np.concatenate((assignments, lists[new]))
+
+        self._commit(assignments)
+
+    def remove(self, ids: list):
+        """
+        Removes the embeddings of the given node ids, if present. Their rows are zeroed in place and left out of
+        the IVF lists, so they are neither searched nor returned by `get`.
+        """
+        self._load()
+        rows, found = self._rows_for(ids)
+        if not found.any():
+            return
+        stored = self._vectors("r+")
+        stored[rows[found]] = 0
+        stored.flush()
+        del stored
+        assignments = self._assignments()
+        assignments[rows[found]] = -1
+        self._commit(assignments)
+
+    def search(self, query, top_k: int = 5, nprobe: int | None = None) -> list[tuple[str, float]]:
+        """
+        Finds the approximate top-k nodes by cosine similarity to the query embedding.
+
+        Args:
+            query: The query embedding.
+            top_k (int, optional): The number of nodes to return. Defaults to 5.
+            nprobe (int, optional): The number of IVF lists to scan. Defaults to 16.
+
+        Returns:
+            list[tuple[str, float]]: The id and similarity score of each node, best first.
+        """
+        self._load()
+        query = _normalize(np.asarray(query, dtype=np.float32))
+        nprobe = min(nprobe or 16, self.meta["nlist"])  # type: ignore
+        lists = np.argsort(-(self.centroids @ query))[:nprobe]  # type: ignore
+        rows = np.concatenate(
+            [self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]] for i in lists]  # type: ignore
+        )
+        return self._top_k(query, rows, top_k)
+
+    def rank(self, query, ids: list, top_k: int = 5) -> list[tuple[str, float]]:
+        """
+        Ranks the given node ids by exact cosine similarity to the query embedding. Nodes without an
+        embedding in the store get a score of -1, as in the Cypher similarity queries.
+
+        Args:
+            query: The query embedding.
+            ids (list): The candidate node ids.
+            top_k (int, optional): The number of nodes to return. Defaults to 5.
+
+        Returns:
+            list[tuple[str, float]]: The id and similarity score of each node, best first.
+        """
+        self._load()
+        if not ids:
+            return []
+        query = _normalize(np.asarray(query, dtype=np.float32))
+        rows, found = self._rows_for(ids)
+        # Removed rows are zeroed and count as missing
+        found[found] = np.any(self.vectors[rows[found]], axis=1)  # type: ignore
+        results = self._top_k(query, rows[found], top_k)
+        missing = [str(node_id) for node_id, is_found in zip(ids, found) if not is_found]
+        return (results + [(node_id, -1.0) for node_id in missing])[:top_k]
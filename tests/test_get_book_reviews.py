@@ -0,0 +1,115 @@
+import os
+import random
+
+# rag_tools reads the configuration on import; no connection is opened
+for name, value in {
+    "ALL_BOOKS_PATH": "books.csv",
+    "ALL_RATINGS_PATH": "ratings.csv",
+    "NEO4J_URI": "bolt://localhost:7687",
+    "NEO4J_USERNAME": "neo4j",
+    "NEO4J_PASSWORD": "neo4j",
+}.items():
+    os.environ.setdefault(name, value)
+
+import pytest
+from agents.tools import rag_tools
+
+CAP = rag_tools.REVIEW_TOKENS_CAP * rag_tools.CHARS_PER_TOKEN
+
+
+class FakeConnection:
+    """
+    Answers the queries of getBookReviews and of the title resolver from a list of reviews of the book "Dune".
+    """
+
+    def __init__(self, reviews: list[dict]):
+        self.reviews = reviews
+
+    def read(self, query, parameters=None):
+        return [{"title": "Dune"}]
+
+    def read_single(self, query, parameters=None):
+        if "Dataset" in query:
+            return {"generation": 1}
+        if parameters.get("book") != "Dune":
+            return None
+        page = self.reviews[parameters["skip"]:parameters["skip"] + parameters["limit"]]
+        max_chars = parameters["max_chars"]
+        return {
+            "total": len(self.reviews),
+            "reviews": [
+                {**review, "summary": review["summary"][:max_chars], "text": review["text"][:max_chars], "truncated": len(review["text"]) > max_chars}
+                for review in page
+            ],
+        }
+
+
+def reviews(count: int, length: int) -> list[dict]:
+    rng = random.Random(count * length)
+    sentences = ["The plot is gripping and the characters feel real.", 'He said "never" \\\\ twice.', "I could not put it down."]
+    return [
+        {
+            "score": 5.0,
+            "helpfulness": "3/4",
+            "time": "1000",
+            "summary": " ".join(rng.choice(sentences) for _ in range(length // 100 + 1)),
+            "text": " ".join(rng.choice(sentences) for _ in range(length // 30 + 1)),
+        }
+        for _ in range(count)
+    ]
+
+
+@pytest.fixture
+def connection(monkeypatch):
+    def install(book_reviews: list[dict]):
+        fake = FakeConnection(book_reviews)
+        monkeypatch.setattr(rag_tools, "neo4j_conn", fake)
+        monkeypatch.setattr(rag_tools.title_resolver, "connection_manager", fake)
+        monkeypatch.setattr(rag_tools.title_resolver, "_index", None)
+
+    return install
+
+
+@pytest.mark.parametrize("summarize", [False, True])
+@pytest.mark.parametrize("count, length", [(1, 100000), (3, 100000), (50, 2000), (50, 50)])
+def test_answer_is_capped(connection, summarize, count, length):
+    connection(reviews(count, length))
+    result = rag_tools.getBookReviews("Dune", limit=50, max_chars=100000, summarize=summarize)
+    assert result["reviews"]
+    assert len(str(result)) <= CAP
+
+
+def test_long_review_is_truncated_to_fit(connection):
+    connection(reviews(1, 100000))
+    review = rag_tools.getBookReviews("Dune", max_chars=100000)["reviews"][0]
+    assert review["truncated"]
+    assert len(review["summary"]) + len(review["text"]) <= CAP // 2
+
+
+def test_pages_follow_the_cursor(connection):
+    connection(reviews(30, 50))
+    first = rag_tools.getBookReviews("dune", limit=20)
+    second = rag_tools.getBookReviews("Dune", limit=20, cursor=first["next_cursor"])
+    assert first["book"] == "Dune"
+    assert first["next_cursor"] == 20
+    assert len(second["reviews"]) == 10
+    assert second["next_cursor"] is None
+
+
+def test_fuzzy_title_is_noted(connection):
+    connection(reviews(3, 50))
+    exact = rag_tools.getBookReviews("dune")
+    fuzzy = rag_tools.getBookReviews("Dunes")
+    assert "note" not in exact
+    assert fuzzy["book"] == "Dune"
+    assert 'Did you mean "Dune"?' in fuzzy["note"]
+
+
+def test_exact_only_lookups_skip_fuzzy_matches(connection):
+    connection(reviews(1, 50))
+    before = rag_tools.title_resolver.stats()
+    assert rag_tools.title_resolver.resolve("Dunes", fuzzy=False).title is None
+    assert rag_tools.title_resolver.resolve("dune", fuzzy=False).method == "normalized"
+    after = rag_tools.title_resolver.stats()
+    assert after["lookups"] == before["lookups"] + 1
+    assert after["retries_saved"] == before["retries_saved"] + 1
@@ -0,0 +1,59 @@
+'''
+Mide el rendimiento de la generación de embeddings en CPU con 1..N procesos
+'''
+
+import os
+import sys
+from utils.db_manager import DBManager
+from models.embedding_manager import EmbeddingManager
+from models.embedding_workers import EmbeddingWorkerPool
+
+# (label, property) of every backfill
+BACKFILLS = [
+    ("Book", "title"),
+    ("Book", "description"),
+    ("Review", "summary"),
+    ("Review", "text"),
+]
+
+
+def read_sample(db_manager: DBManager, node_label: str, node_property: str, sample: int) -> list[str]:
+    query = f"MATCH (n:{node_label}) WHERE n.{node_property} IS NOT NULL RETURN n.{node_property} AS text LIMIT {sample}"
+    return [row["text"] for row in db_manager.fetch_data(query)]
+
+
+def benchmark(sample: int, max_workers: int):
+    '''
+    Encodes a sample of every backfill with 1, 2, 4... up to max_workers processes, splitting the cores
+    between them, and prints the throughput of each run
+    '''
+    db_manager = DBManager()
+    embedding_manager = EmbeddingManager()
+    cores = os.cpu_count() or 1
+    samples = {backfill: read_sample(db_manager, *backfill, sample) for backfill in BACKFILLS}
+    # Throughput with a single worker, the reference of the speedup
+    baselines = {}
+
+    workers = 1
+    print(f"{'backfill':<20}{'workers':>8}{'threads':>8}{'texts/s':>10}{'tokens/s':>12}{'speedup':>9}")
+    while workers <= max_workers:
+        pool = EmbeddingWorkerPool(workers, max(1, cores // workers))
+        # Warm-up so that model loading is not measured
+        list(pool.imap([["warm-up"]] * workers))
+        for (node_label, node_property), texts in samples.items():
+            _, stats = embedding_manager.generate_bulk_embeddings(texts, workers=pool)
+            key = f"{node_label}.{node_property}"
+            baselines.setdefault(key, stats["tokens_per_second"])
+            print(
+                f"{key:<20}{workers:>8}{pool.threads_per_worker:>8}"
+                f"{stats['texts'] / stats['seconds']:>10.1f}{stats['tokens_per_second']:>12.0f}"
+                f"{stats['tokens_per_second'] / baselines[key]:>8.2f}x"
+            )
+        pool.close()
+        workers *= 2
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('Usage: python benchmark-embeddings.py <sample> <max_workers>')
+        sys.exit(1)
+    benchmark(int(sys.argv[1]), int(sys.argv[2]))
@@ -0,0 +1,42 @@
+'''
+Mide la caché de metadatos de los libros: tiempo de precarga, memoria ocupada y latencia de las búsquedas
+'''
+
+import random
+import sys
+import time
+from utils.metadata_cache import MetadataCache
+
+
+def benchmark(books: int, lookups: int):
+    '''
+    Warms the cache with the most rated books, then looks up random cached titles one at a time and prints
+    the memory of the cache and the mean and 99th percentile latency of the lookups
+    '''
+    cache = MetadataCache(books)
+    start = time.perf_counter()
+    warmed = cache.warm()
+    print(f"Warmed {warmed} books in {time.perf_counter() - start:.1f}s")
+    memory = cache.memory_bytes()
+    print(f"Memory: {memory / 2**20:.1f} MiB ({memory / max(warmed, 1):.0f} bytes per book)")
+
+    titles = list(cache._entries)
+    rng = random.Random(1)
+    latencies = []
+    for _ in range(lookups):
+        title = rng.choice(titles)
+        start = time.perf_counter()
+        cache.get([title])
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    print(
+        f"Lookups: {sum(latencies) / len(latencies) * 1e6:.1f} us mean, "
+        f"{latencies[int(len(latencies) * 0.99)] * 1e6:.1f} us p99"
+    )
+    print(cache.stats())
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('Usage: python benchmark-metadata-cache.py <books> <lookups>')
+        sys.exit(1)
+    benchmark(int(sys.argv[1]), int(sys.argv[2]))
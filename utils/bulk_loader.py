@@ -0,0 +1,283 @@
+import os
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import pandas as pd
+import pyarrow.compute as pc
+from utils.connection_manager import ConnectionManager
+from utils.embedding_writer import text_hash
+from utils.env_loader import EnvLoader
+from utils.parquet_dataset import is_parquet, read_frame
+
+CONSTRAINTS = [
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (b:Book) REQUIRE b.title IS UNIQUE",
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (u:User) REQUIRE u.userId IS UNIQUE",
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (a:Author) REQUIRE a.name IS UNIQUE",
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (p:Publisher) REQUIRE p.name IS UNIQUE",
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (g:Genre) REQUIRE g.name IS UNIQUE",
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (r:Review) REQUIRE r.reviewId IS UNIQUE",
+    # Used by utils/title_resolver.py to resolve misspelled titles
+    "CREATE FULLTEXT INDEX book_title_fulltext IF NOT EXISTS FOR (b:Book) ON EACH [b.title]",
+]
+
+BOOK_COLUMNS = ["Title", "description", "authors", "image", "previewLink", "publisher", "publishedDate", "infoLink", "categories", "ratingsCount"]
+
+RATING_COLUMNS = ["Id", "Title", "User_id", "profileName", "review/helpfulness", "review/score", "review/time", "review/summary", "review/text"]
+
+BOOK_PROPERTIES = {
+    "description": "description",
+    "image": "image",
+    "previewLink": "previewLink",
+    "publishedDate": "publishedDate",
+    "infoLink": "infoLink",
+    "ratingsCount": "ratingsCount",
+}
+
+REVIEW_PROPERTIES = {
+    "review/helpfulness": "helpfulness",
+    "review/score": "score",
+    "review/time": "time",
+    "review/summary": "summary",
+    "review/text": "text",
+}
+
+# Counts the loads of the dataset, so that the caches of the data read from the database (see
+# agents/tools/rag_tools.py) are invalidated after a reload. Also run at the end of utils/load.cypher
+BUMP_GENERATION = """
+MERGE (d:Dataset {name: $name})
+SET d.generation = coalesce(d.generation, 0) + 1
+RETURN d.generation AS generation
+"""
+
+DATASET_NAME = "books"
+
+# (relationship, start label, start key, end label, end key) of every relationship loaded
+RELATIONSHIPS = [
+    ("WRITTEN_BY", "Book", "title", "Author", "name"),
+    ("PUBLISHED_BY", "Book", "title", "Publisher", "name"),
+    ("BELONGS_TO", "Book", "title", "Genre", "name"),
+    ("WROTE_REVIEW", "User", "userId", "Review", "reviewId"),
+    ("REVIEWS", "Review", "reviewId", "Book", "title"),
+]
+
+
+def _split_list(value: str) -> list[str]:
+    # "['A', 'B']" -> ["'A'", "'B'"], the names produced by utils/load.cypher
+    if not isinstance(value, str) or len(value) <= 2:
+        return []
+    return [name.strip() for name in value.replace("[", "").replace("]", "").split(",") if name.strip()]
+
+
+def _native(value):
+    # NumPy scalars are not accepted as query parameters
+    return value.item() if hasattr(value, "item") else value
+
+
+def _partition(value: str, partitions: int) -> int:
+    return zlib.crc32(value.encode("utf-8")) % partitions
+
+
+class BulkLoader:
+    """
+    BulkLoader loads the books and ratings CSV files into Neo4j, replacing utils/load.cypher.
+
+    The files are read and deduplicated with pandas, so every author, genre, publisher, user, book and review is
+    written once. Constraints are created first, so every MERGE is an index lookup. Nodes are written in large
+    UNWIND batches, one label after another. Relationships are written by a pool of threads in partitions that
+    never share a node: pairs are split into a partitions x partitions grid by the hash of each endpoint, and
+    each round writes one diagonal of the grid, whose cells have distinct start and end partitions, so
+    concurrent transactions do not wait on each other's node locks.
+
+    Every write is a MERGE on a unique key, so loading the same files again does not duplicate anything. Reviews
+    have no key in the dataset, so `reviewId` is the hash of the user, book, time, summary and text.
+
+    Methods:
+        read(books_path: str, ratings_path: str):
+
+        load():
+
+        export_admin_csv(directory: str):
+    """
+
+    def __init__(self, batch_size: int | None = None, workers: int = 4):
+        """
+        Args:
+            batch_size (int, optional): The number of rows per UNWIND transaction. Defaults to BATCH_SIZE.
+            workers (int, optional): The number of threads, and of partitions per endpoint, of the relationships.
+                                     Defaults to 4.
+        """
+        self.connection_manager = ConnectionManager()
+        self.batch_size = batch_size or EnvLoader().batch_size
+        self.workers = workers
+        self.nodes = {}
+        self.relationships = {}
+        self.stats = {}
+
+    @contextmanager
+    def _phase(self, name: str, rows: int = 0):
+        # Yields the phase, whose row count can be set once known
+        phase = {"rows": rows}
+        start = time.perf_counter()
+        yield phase
+        seconds = time.perf_counter() - start
+        rows = phase["rows"]
+        self.stats[name] = {"rows": rows, "seconds": seconds, "rows_per_second": rows / seconds if seconds else 0.0}
+        print(f"{name}: {rows} rows in {seconds:.1f}s ({self.stats[name]['rows_per_second']:.0f} rows/s)", flush=True)
+
+    @staticmethod
+    def _read(path: str, columns: list[str], filter: pc.Expression | None = None) -> pd.DataFrame:
+        # Every value as a string with empty values as nulls, whatever the format
+        if is_parquet(path):
+            return read_frame(path, columns, filter).astype("string")
+        return pd.read_csv(path, dtype=str, usecols=columns).replace("", pd.NA)
+
+    def read(self, books_path: str, ratings_path: str):
+        """
+        Reads and deduplicates the books and ratings files, with the same rules as utils/load.cypher: rows without
+        title or user are skipped, a repeated book keeps the last non-empty value of each column and reviews of
+        unknown books are kept without their REVIEWS relationship.
+
+        Parquet files (see utils/parquet_dataset.py) are read much faster than CSV: only the used columns are read
+        and ratings without user are skipped while reading.
+
+        Args:
+            books_path (str): The books CSV or Parquet file (books_data.csv).
+            ratings_path (str): The ratings CSV file, processed by data/dataset_corrections.py, or its Parquet file.
+        """
+        with self._phase("read") as phase:
+            books = self._read(books_path, BOOK_COLUMNS)
+            books["Title"] = books["Title"].str.strip().replace("", pd.NA)
+            books = books.dropna(subset=["Title"])
+            ratings = self._read(ratings_path, RATING_COLUMNS, pc.field("User_id").is_valid())
+            ratings["User_id"] = ratings["User_id"].str.strip().replace("", pd.NA)
+            ratings["Title"] = ratings["Title"].str.strip().replace("", pd.NA)
+            ratings = ratings.dropna(subset=["User_id"])
+            phase["rows"] = len(books) + len(ratings)
+
+        with self._phase("deduplicate", len(books) + len(ratings)):
+            # The last non-empty value of every column, like the CASE expressions of the original SET
+            book_nodes = books.groupby("Title", sort=False).last()
+            book_nodes = book_nodes[list(BOOK_PROPERTIES)].rename(columns=BOOK_PROPERTIES)
+            book_nodes["ratingsCount"] = pd.to_numeric(book_nodes["ratingsCount"], errors="coerce").astype("Int64")
+            known = ratings[ratings["Title"].isin(book_nodes.index)]
+            book_nodes["bookId"] = known.groupby("Title", sort=False)["Id"].last()
+            book_nodes.index.name = "title"
+
+            authors = books[["Title", "authors"]].assign(name=books["authors"].map(_split_list)).explode("name").dropna(subset=["name"])
+            genres = books[["Title", "categories"]].assign(name=books["categories"].map(_split_list)).explode("name").dropna(subset=["name"])
+            publishers = books[["Title", "publisher"]].dropna(subset=["publisher"])
+
+            users = ratings.groupby("User_id", sort=False)["profileName"].last().rename_axis("userId")
+
+            review_keys = ratings[["User_id", "Title", "review/time", "review/summary", "review/text"]].fillna("")
+            ratings = ratings.assign(reviewId=review_keys.astype(str).agg("\x1f".join, axis=1).map(text_hash))
+            ratings = ratings.drop_duplicates(subset="reviewId", keep="last")
+            reviews = ratings.set_index("reviewId")[list(REVIEW_PROPERTIES)].rename(columns=REVIEW_PROPERTIES)
+            reviews["score"] = pd.to_numeric(reviews["score"], errors="coerce")
+
+            self.nodes = {
+                "Author": pd.DataFrame(index=pd.Index(authors["name"].unique(), name="name")),
+                "Genre": pd.DataFrame(index=pd.Index(genres["name"].unique(), name="name")),
+                "Publisher": pd.DataFrame(index=pd.Index(publishers["publisher"].unique(), name="name")),
+                "User": users.to_frame(),
+                "Book": book_nodes,
+                "Review": reviews,
+            }
+            self.relationships = {
+                "WRITTEN_BY": authors[["Title", "name"]].drop_duplicates().to_numpy(),
+                "PUBLISHED_BY": publishers[["Title", "publisher"]].drop_duplicates().to_numpy(),
+                "BELONGS_TO": genres[["Title", "name"]].drop_duplicates().to_numpy(),
+                "WROTE_REVIEW": ratings[["User_id", "reviewId"]].to_numpy(),
+                "REVIEWS": ratings.loc[ratings["Title"].isin(book_nodes.index), ["reviewId", "Title"]].to_numpy(),
+            }
+
+    def _write_nodes(self, label: str, key: str, frame: pd.DataFrame):
+        query = f"""
+        UNWIND $rows AS row
+        MERGE (n:{label} {{{key}: row.key}})
+        SET n += row.properties
+        """
+        columns = list(frame.columns)
+        with self._phase(f"{label} nodes", len(frame)):
+            for i in range(0, len(frame), self.batch_size):
+                chunk = frame.iloc[i:i + self.batch_size]
+                rows = [
+                    {"key": index, "properties": {column: _native(value) for column, value in zip(columns, values) if not pd.isna(value)}}
+                    for index, *values in chunk.itertuples(name=None)
+                ]
+                self.connection_manager.write(query, {"rows": rows})
+
+    def _write_relationships(self, relationship: str, start_label: str, start_key: str, end_label: str, end_key: str, pairs):
+        query = f"""
+        UNWIND $rows AS row
+        MATCH (a:{start_label} {{{start_key}: row[0]}})
+        MATCH (b:{end_label} {{{end_key}: row[1]}})
+        MERGE (a)-[:{relationship}]->(b)
+        """
+        partitions = self.workers
+        cells = [[[] for _ in range(partitions)] for _ in range(partitions)]
+        for start, end in pairs:
+            cells[_partition(start, partitions)][_partition(end, partitions)].append([start, end])
+
+        def write_cell(rows: list):
+            for i in range(0, len(rows), self.batch_size):
+                self.connection_manager.write(query, {"rows": rows[i:i + self.batch_size]})
+
+        with self._phase(f"{relationship} relationships", len(pairs)), ThreadPoolExecutor(self.workers) as executor:
+            for diagonal in range(partitions):
+                # The cells of a diagonal have distinct start and end partitions, so they never lock the same node
+                futures = [executor.submit(write_cell, cells[i][(i + diagonal) % partitions]) for i in range(partitions)]
+                for future in futures:
+                    future.result()
+
+    def load(self):
+        """
+        Writes the data read by `read` to the database: constraints, then nodes, then relationships. The rows per
+        second of every phase are printed and kept in `stats`.
+        """
+        with self._phase("constraints", len(CONSTRAINTS)):
+            for constraint in CONSTRAINTS:
+                self.connection_manager.write(constraint)
+
+        for label, frame in self.nodes.items():
+            self._write_nodes(label, frame.index.name, frame)
+
+        for relationship, start_label, start_key, end_label, end_key in RELATIONSHIPS:
+            self._write_relationships(relationship, start_label, start_key, end_label, end_key, self.relationships[relationship])
+
+        self.connection_manager.write(BUMP_GENERATION, {"name": DATASET_NAME})
+
+        total_rows = sum(phase["rows"] for name, phase in self.stats.items() if name not in ("read", "deduplicate", "constraints"))
+        total_seconds = sum(phase["seconds"] for phase in self.stats.values())
+        print(f"Loaded {total_rows} nodes and relationships in {total_seconds:.1f}s")
+
+    def export_admin_csv(self, directory: str):
+        """
+        Writes the data read by `read` as `neo4j-admin database import` CSV files, the fastest way to load an empty
+        database, and prints the import command. The import creates no schema, so the constraints, the full-text
+        index and the dataset generation bump that `load` runs are written to `post-import.cypher`, to be run with
+        cypher-shell once the database is started.
+
+        Args:
+            directory (str): The output directory.
+        """
+        os.makedirs(directory, exist_ok=True)
+        types = {"ratingsCount": ":long", "score": ":float"}
+        arguments = []
+        with self._phase("admin csv", sum(map(len, self.nodes.values())) + sum(map(len, self.relationships.values()))):
+            for label, frame in self.nodes.items():
+                path = os.path.join(directory, f"{label}.csv")
+                header = {column: f"{column}{types.get(column, '')}" for column in frame.columns}
+                frame.rename(columns=header).rename_axis(f"{frame.index.name}:ID({label})").to_csv(path)
+                arguments.append(f"--nodes={label}={path}")
+            for relationship, start_label, _, end_label, _ in RELATIONSHIPS:
+                path = os.path.join(directory, f"{relationship}.csv")
+                pd.DataFrame(self.relationships[relationship], columns=[f":START_ID({start_label})", f":END_ID({end_label})"]).to_csv(path, index=False)
+                arguments.append(f"--relationships={relationship}={path}")
+        schema_path = os.path.join(directory, "post-import.cypher")
+        with open(schema_path, "w") as file:
+            for statement in CONSTRAINTS + [BUMP_GENERATION.replace("$name", f'"{DATASET_NAME}"')]:
+                file.write(statement.strip() + ";\n")
+        print("neo4j-admin database import full neo4j --overwrite-destination --multiline-fields=true " + " ".join(arguments))
+        print(f"Once the database is started: cypher-shell -f {schema_path}")
@@ -0,0 +1,218 @@
+import threading
+import time
+from contextlib import contextmanager
+from neo4j import Driver, Record, READ_ACCESS, WRITE_ACCESS
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+from utils import db
+from utils.env_loader import EnvLoader
+
+RETRYABLE_ERRORS = (ServiceUnavailable, SessionExpired, TransientError)
+
+
+class ConnectionManager:
+    """
+    ConnectionManager owns the Neo4j driver shared by every tool and by DBManager in the process.
+
+    The driver is created lazily on first use with a bounded connection pool (NEO4J_POOL_SIZE) and a liveness
+    check for connections that have been idle (NEO4J_LIVENESS_CHECK_TIMEOUT). Queries run as managed read or
+    write transactions, so reads can be routed to followers, and transient errors are retried with exponential
+    backoff (NEO4J_MAX_RETRIES, NEO4J_RETRY_DELAY).
+
+    Methods:
+        session(access_mode: str = READ_ACCESS, **config):
+
+        read(query: str, parameters: dict | None = None):
+
+        read_single(query: str, parameters: dict | None = None):
+
+        write(query: str, parameters: dict | None = None):
+
+        stream(query: str, parameters: dict | None = None, page_size: int = 1000):
+
+        metrics():
+
+        close():
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(ConnectionManager, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not hasattr(self, "initialized"):
+            env_loader = EnvLoader()
+            self.pool_size = env_loader.neo4j_pool_size
+            self.max_retries = env_loader.neo4j_max_retries
+            self.retry_delay = env_loader.neo4j_retry_delay
+            self.liveness_check_timeout = env_loader.neo4j_liveness_check_timeout
+            self._driver = None
+            self._metrics_lock = threading.Lock()
+            self._in_use = 0
+            self._peak_in_use = 0
+            self._acquisitions = 0
+            self._acquisition_wait_total = 0.0
+            self._acquisition_wait_max = 0.0
+            self._retries = 0
+            self.initialized = True
+
+    @property
+    def driver(self) -> Driver:
+        """
+        The shared driver, created and checked for connectivity on first access.
+        """
+        if self._driver is None:
+            with self._lock:
+                if self._driver is None:
+                    driver = db.connect(
+                        max_connection_pool_size=self.pool_size,
+                        liveness_check_timeout=self.liveness_check_timeout,
+                        # Retries are handled here, with the configured backoff
+                        max_transaction_retry_time=0,
+                    )
+                    driver.verify_connectivity()
+                    self._driver = driver
+        return self._driver
+
+    @contextmanager
+    def session(self, access_mode: str = READ_ACCESS, **config):
+        """
+        Opens a session on the shared driver. Sessions are cheap, the connections behind them are pooled.
+
+        Args:
+            access_mode (str, optional): READ_ACCESS or WRITE_ACCESS. Defaults to READ_ACCESS.
+            **config: Any other session configuration.
+        """
+        with self._metrics_lock:
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+        try:
+            with self.driver.session(default_access_mode=access_mode, **config) as session:
+                yield session
+        finally:
+            with self._metrics_lock:
+                self._in_use -= 1
+
+    def _record_acquisition(self, wait: float):
+        with self._metrics_lock:
+            self._acquisitions += 1
+            self._acquisition_wait_total += wait
+            self._acquisition_wait_max = max(self._acquisition_wait_max, wait)
+
+    def _execute(self, access_mode: str, query: str, parameters: dict) -> list[Record]:
+        delay = self.retry_delay
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            acquired = []
+
+            def work(tx):
+                # The transaction function only starts once a pooled connection has been acquired
+                if not acquired:
+                    acquired.append(True)
+                    self._record_acquisition(time.perf_counter() - start)
+                return list(tx.run(query, parameters))
+
+            try:
+                with self.session(access_mode) as session:
+                    if access_mode == READ_ACCESS:
+                        return session.execute_read(work)
+                    return session.execute_write(work)
+            except RETRYABLE_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                with self._metrics_lock:
+                    self._retries += 1
+                time.sleep(delay)
+                delay *= 2
+        return []
+
+    def read(self, query: str, parameters: dict | None = None) -> list[Record]:
+        """
+        Runs a query in a read transaction, retrying transient errors.
+
+        Args:
+            query (str): The Cypher query.
+            parameters (dict, optional): The query parameters.
+
+        Returns:
+            list[Record]: The records of the result.
+        """
+        return self._execute(READ_ACCESS, query, parameters or {})
+
+    def read_single(self, query: str, parameters: dict | None = None) -> Record | None:
+        """
+        Runs a query in a read transaction and returns its first record, or None if there is none.
+        """
+        records = self.read(query, parameters)
+        return records[0] if records else None
+
+    def write(self, query: str, parameters: dict | None = None) -> list[Record]:
+        """
+        Runs a query in a write transaction, retrying transient errors.
+
+        Args:
+            query (str): The Cypher query.
+            parameters (dict, optional): The query parameters.
+
+        Returns:
+            list[Record]: The records of the result.
+        """
+        return self._execute(WRITE_ACCESS, query, parameters or {})
+
+    def stream(self, query: str, parameters: dict | None = None, page_size: int = 1000):
+        """
+        Runs a read query once and yields its records in pages, pulled from the server as they are consumed, so
+        that a whole label is read in a single pass with one page in memory, instead of re-running a query per
+        page with SKIP or a sorted cursor. The transaction stays open until the last page is consumed and is not
+        retried; nodes written meanwhile by other transactions do not disturb it.
+
+        Args:
+            query (str): The Cypher query.
+            parameters (dict, optional): The query parameters.
+            page_size (int, optional): The number of records per page, also fetched per round trip. Defaults to 1000.
+
+        Yields:
+            list[Record]: The records of each page.
+        """
+        with self.session(READ_ACCESS, fetch_size=page_size) as session:
+            page = []
+            for record in session.run(query, parameters or {}):
+                page.append(record)
+                if len(page) == page_size:
+                    yield page
+                    page = []
+            if page:
+                yield page
+
+    def metrics(self) -> dict:
+        """
+        Returns the pool metrics, to size NEO4J_POOL_SIZE under concurrent chat sessions.
+
+        Returns:
+            dict: The pool size, the sessions in use now and at peak, the number of connection acquisitions,
+                  their average and maximum wait in milliseconds and the number of retried transactions.
+        """
+        with self._metrics_lock:
+            return {
+                "pool_size": self.pool_size,
+                "in_use": self._in_use,
+                "peak_in_use": self._peak_in_use,
+                "acquisitions": self._acquisitions,
+                "avg_acquisition_wait_ms": (self._acquisition_wait_total / self._acquisitions * 1000) if self._acquisitions else 0.0,
+                "max_acquisition_wait_ms": self._acquisition_wait_max * 1000,
+                "retries": self._retries,
+            }
+
+    def close(self):
+        """
+        Closes the shared driver. The next access creates a new one.
+        """
+        with self._lock:
+            if self._driver is not None:
+                self._driver.close()
+                self._driver = None
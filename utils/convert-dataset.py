@@ -0,0 +1,15 @@
+'''
+Convierte los CSV del dataset, ya corregidos, a ficheros Parquet tipados y comprimidos que el resto
+de pasos (reduce-dataset.py, load-dataset.py) leen mucho más rápido
+'''
+
+import sys
+from utils.parquet_dataset import BOOKS_SCHEMA, RATINGS_SCHEMA, convert_csv, parquet_path
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('Usage: python convert-dataset.py <books_csv> <ratings_csv>')
+        sys.exit(1)
+    for csv_path, schema in ((sys.argv[1], BOOKS_SCHEMA), (sys.argv[2], RATINGS_SCHEMA)):
+        stats = convert_csv(csv_path, schema)
+        print(f"{csv_path} -> {parquet_path(csv_path)}: {stats['rows']} rows, {stats['skipped']} skipped, {stats['seconds']:.1f}s")
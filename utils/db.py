@@ -3,15 +3,17 @@ from utils.env_loader import EnvLoader
 
 env_loader = EnvLoader()
 
-def connect() -> Driver:
+def connect(**config) -> Driver:
     """
-    Connect to the Neo4j database for the project
+    Connect to the Neo4j database for the project.
+    Any keyword argument is passed to the driver as configuration (pool size, timeouts...).
+    Long-lived code should use the shared driver of utils.connection_manager.ConnectionManager instead.
     """
     uri = env_loader.neo4j_uri
     user = env_loader.neo4j_user
     password = env_loader.neo4j_password
 
-    return GraphDatabase.driver(uri=uri, auth=(user, password))  # type: ignore
+    return GraphDatabase.driver(uri=uri, auth=(user, password), **config)  # type: ignore
 
 
 def restart():
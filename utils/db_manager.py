@@ -1,12 +1,21 @@
+import json
 import os
-import pickle
+import time
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from py2neo import Graph
 from transformers import AutoModel, AutoTokenizer
 import torch
-from utils import db
+from utils.connection_manager import ConnectionManager
 from tqdm import tqdm
 from models.embedding_manager import EmbeddingManager
+from models.embedding_codec import decode_embedding, encode_embedding
+from models.vector_store import VectorStore, summarize
+from utils.embedding_writer import EmbeddingWriter, text_hash
 from utils.env_loader import EnvLoader
+from utils.parquet_dataset import COMPRESSION, iter_frames
 
 env_loader = EnvLoader()
 NEO4J_URI = env_loader.neo4j_uri
@@ -14,6 +23,9 @@ NEO4J_USER = env_loader.neo4j_user
 NEO4J_PASSWORD = env_loader.neo4j_password
 BATCH_SIZE = env_loader.batch_size
 
+# The reviews whose embeddings are read at once to aggregate them, about 6 KB each as float32 vectors
+REVIEW_PAGE_SIZE = 1000
+
 
 def connect_to_graph():
     return Graph(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
@@ -38,9 +50,11 @@ class DBManager:
         Initializes the ProjectionManager instance and establishes a connection to the Neo4j database.
 
         Attributes:
-            db_connection (neo4j.GraphDatabase.driver): The connection object to interact with the Neo4j database.
+            connection_manager (ConnectionManager): The process-wide connection manager.
+            db_connection (neo4j.GraphDatabase.driver): The pooled driver shared with the agent tools.
         """
-        self.db_connection = db.connect()
+        self.connection_manager = ConnectionManager()
+        self.db_connection = self.connection_manager.driver
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.graph = None
         self.model = None
@@ -159,67 +173,410 @@ class DBManager:
             result = session.run(query)  # type: ignore
             return [record.data() for record in result]
 
-    def generate_embeddings_for(self, node_label: str, node_property: str, node_id_property: str, model_name: str, batch_size: int=32):
+    def generate_embeddings_for(self, node_label: str, node_property: str, node_id_property: str, model_name: str, batch_size: int=32, max_batch_tokens: int | None=None):
+        """
+        Generates the embeddings of a node property and writes them to `<node_property>_embedding`, with the hash
+        of each text in `<node_property>_embedding_hash` (see EmbeddingIndexer).
+        Texts are encoded in length-sorted batches under a token budget (see EmbeddingManager.generate_bulk_embeddings)
+        and handed every BATCH_SIZE * 100 texts to background writer threads (see EmbeddingWriter), so encoding and
+        writing overlap.
+
+        Args:
+            node_label (str): The label of the nodes.
+            node_property (str): The property to encode.
+            node_id_property (str): The property used as node id, or an empty string to use the element id.
+            model_name (str): The embeddings model, kept for compatibility; EMBEDDINGS_MODEL is used.
+            batch_size (int, optional): The maximum number of texts in a batch. Defaults to 32.
+            max_batch_tokens (int, optional): The token budget of a batch. Defaults to EMBEDDINGS_BATCH_TOKENS.
+        """
         if node_id_property:
             query = f"MATCH (n:{node_label}) WHERE n.{node_property} IS NOT NULL RETURN n.{node_id_property} as nodeId, n.{node_property} as text"
         else:
             query = f"MATCH (n:{node_label}) WHERE n.{node_property} IS NOT NULL RETURN elementId(n) as nodeId, n.{node_property} as text"
         data = self.fetch_data(query)
         
-        embeddings = []
         texts = [row["text"] for row in data]
         node_ids = [row["nodeId"] for row in data]
+        chunk_size = BATCH_SIZE * 100
+        vector_dimension = 0
         
-        with tqdm(total=len(texts), desc="Generating embeddings") as pbar:
-            for i in range(0, len(texts), batch_size):
-                batch_texts = texts[i:i + batch_size]
-                batch_node_ids = node_ids[i:i + batch_size]
-                batch_embeddings = self.embedding_manager.generate_text_embedding(batch_texts)
-                embeddings.extend(zip(batch_node_ids, batch_embeddings))
-                pbar.update(len(batch_texts))
-                
-                if len(embeddings) >= BATCH_SIZE * 100:
-                    self._save_embeddings_to_db(embeddings, node_label, node_property, node_id_property)
-                    embeddings = []
-
-        if embeddings:
-            self._save_embeddings_to_db(embeddings, node_label, node_property, node_id_property)
-
-        vector_dimension = len(embeddings[0][1]) if embeddings else 0
-        self.create_vector_index(node_label, f"{node_property}_embedding", vector_dimension)
-
-    def _save_embeddings_to_db(self, embeddings, node_label, node_property, node_id_property):
-        with tqdm(total=len(embeddings), desc="Writing to db") as pbar:
-            for i in range(0, len(embeddings), BATCH_SIZE):
-                batch = embeddings[i:i + BATCH_SIZE]
-                if node_id_property:
-                    query = f"""
-                    UNWIND $batch AS row
-                    MATCH (n:{node_label} {{{node_id_property}: row.nodeId}})
-                    SET n.{node_property}_embedding = row.embedding
-                    """
-                else:
-                    query = f"""
-                    UNWIND $batch AS row
-                    MATCH (n:{node_label}) WHERE elementId(n) = row.nodeId
-                    SET n.{node_property}_embedding = row.embedding
-                    """
-                with self.db_connection.session() as session:
-                    session.run(query, batch=[{"nodeId": node_id, "embedding": embedding} for node_id, embedding in batch]) # type: ignore
-                pbar.update(len(batch))
-
-    def export_property_to_pickle(self, node_label: str, node_property: str, node_id_property: str):
+        with tqdm(total=len(texts), desc="Generating embeddings") as pbar, self._embedding_writer(node_label, node_property, node_id_property) as writer:
+            encode_time = 0.0
+            for i in range(0, len(texts), chunk_size):
+                chunk_embeddings, stats = self.embedding_manager.generate_bulk_embeddings(
+                    texts[i:i + chunk_size],
+                    max_batch_tokens=max_batch_tokens,
+                    max_batch_size=batch_size,
+                    on_batch=pbar.update,
+                )
+                encode_time += stats["seconds"]
+                vector_dimension = len(chunk_embeddings[0])
+                writer.put(list(zip(node_ids[i:i + chunk_size], chunk_embeddings, map(text_hash, texts[i:i + chunk_size]))))
+                self._set_pipeline_postfix(pbar, stats, writer, encode_time)
+
+        if vector_dimension:
+            self._index_embeddings(node_label, node_property, node_id_property, vector_dimension)
+
+    def stream_embeddings_for(
+        self,
+        node_label: str,
+        node_property: str,
+        node_id_property: str,
+        page_size: int | None = None,
+        checkpoint_path: str | None = None,
+        batch_size: int = 32,
+        max_batch_tokens: int | None = None,
+    ):
+        """
+        Generates the embeddings of a node property in a streaming, resumable way, holding one page of nodes in
+        memory at a time. The nodes without `<node_property>_embedding` are read by a single query streamed page by
+        page (see ConnectionManager.stream), so the label is scanned once, without sorting. Pages are written by
+        background writer threads while the next one is encoded; once a page and every previous one are written,
+        the number of nodes done is saved to a checkpoint file. A rerun after a crash reads again only the nodes
+        still without an embedding. The checkpoint is removed once the backfill completes.
+
+        Args:
+            node_label (str): The label of the nodes.
+            node_property (str): The property to encode.
+            node_id_property (str): The property used as node id, or an empty string to use the element id.
+            page_size (int, optional): The number of nodes read, encoded and written per page. Defaults to BATCH_SIZE * 10.
+            checkpoint_path (str, optional): The checkpoint file. Defaults to `<node_label>_<node_property>_embeddings.checkpoint.json`.
+            batch_size (int, optional): The maximum number of texts in an encoder batch. Defaults to 32.
+            max_batch_tokens (int, optional): The token budget of an encoder batch. Defaults to EMBEDDINGS_BATCH_TOKENS.
+        """
+        page_size = page_size or BATCH_SIZE * 10
+        checkpoint_path = checkpoint_path or f"{node_label}_{node_property}_embeddings.checkpoint.json"
+        id_expression = f"n.{node_id_property}" if node_id_property else "elementId(n)"
+
+        checkpoint = {"processed": 0}
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as file:
+                checkpoint = json.load(file)
+            print(f"Resuming from checkpoint {checkpoint_path} after {checkpoint['processed']} nodes")
+
+        pending_query = f"""
+        MATCH (n:{node_label})
+        WHERE n.{node_property} IS NOT NULL AND n.{node_property}_embedding IS NULL
+        RETURN count(n) AS pending
+        """
+        page_query = f"""
+        MATCH (n:{node_label})
+        WHERE n.{node_property} IS NOT NULL AND n.{node_property}_embedding IS NULL
+        RETURN {id_expression} AS nodeId, n.{node_property} AS text
+        """
+        pending = self.connection_manager.read_single(pending_query)["pending"]  # type: ignore
+        vector_dimension = 0
+        processed = checkpoint["processed"]
+        encode_time = 0.0
+
+        with tqdm(total=pending, desc="Generating embeddings") as pbar, self._embedding_writer(node_label, node_property, node_id_property) as writer:
+            for page in self.connection_manager.stream(page_query, page_size=page_size):
+                node_ids = [record["nodeId"] for record in page]
+                texts = [record["text"] for record in page]
+                embeddings, stats = self.embedding_manager.generate_bulk_embeddings(
+                    texts,
+                    max_batch_tokens=max_batch_tokens,
+                    max_batch_size=batch_size,
+                    on_batch=pbar.update,
+                )
+                encode_time += stats["seconds"]
+                vector_dimension = len(embeddings[0])
+                processed += len(page)
+                writer.put(list(zip(node_ids, embeddings, map(text_hash, texts))), tag=processed)
+                self._set_pipeline_postfix(pbar, stats, writer, encode_time)
+
+                completed = writer.completed_tag()
+                if completed is not None and completed != checkpoint["processed"]:
+                    checkpoint = {"processed": completed, "updated": time.time()}
+                    # Written aside and renamed so that a crash never leaves a truncated checkpoint
+                    with open(f"{checkpoint_path}.tmp", "w") as file:
+                        json.dump(checkpoint, file)
+                    os.replace(f"{checkpoint_path}.tmp", checkpoint_path)
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        if vector_dimension:
+            self._index_embeddings(node_label, node_property, node_id_property, vector_dimension)
+
+    def _index_embeddings(self, node_label: str, node_property: str, node_id_property: str, vector_dimension: int):
+        # Neo4j vector indexes only accept lists of floats, binary embeddings are indexed by the local vector store
+        if env_loader.embeddings_storage == "list":
+            self.create_vector_index(node_label, f"{node_property}_embedding", vector_dimension)
+        else:
+            self.build_vector_store(node_label, node_property, node_id_property)
+
+    def _embedding_writer(self, node_label: str, node_property: str, node_id_property: str) -> EmbeddingWriter:
+        return EmbeddingWriter(
+            node_label,
+            node_property,
+            node_id_property,
+            batch_size=BATCH_SIZE,
+            workers=env_loader.embeddings_writers,
+            queue_size=env_loader.embeddings_write_queue,
+            hashed=True,
+        )
+
+    @staticmethod
+    def _set_pipeline_postfix(pbar: tqdm, stats: dict, writer: EmbeddingWriter, encode_time: float):
+        writer_stats = writer.stats()
+        pbar.set_postfix(
+            tokens_per_s=f"{stats['tokens_per_second']:.0f}",
+            padding=f"{stats['padding_waste']:.1%}",
+            encode_s=f"{encode_time:.1f}",
+            write_s=f"{writer_stats['write_s']:.1f}",
+            queued=writer_stats["queued"],
+            blocked_s=f"{writer_stats['backpressure_s']:.1f}",
+        )
+
+    def export_property_to_parquet(self, node_label: str, node_property: str, node_id_property: str, path: str | None = None, page_size: int | None = None):
+        """
+        Exports the texts of a node property and their embeddings, decoded to float32, to a zstd-compressed Parquet
+        file with columns nodeId, text and embedding, one row group per page of nodes. build_vector_store can read
+        it instead of the database.
+
+        Args:
+            node_label (str): The label of the nodes.
+            node_property (str): The exported property.
+            node_id_property (str): The property used as node id, or an empty string to use the element id.
+            path (str, optional): The output file. Defaults to `<node_label>_<node_property>.parquet`.
+            page_size (int, optional): The number of nodes read per page. Defaults to BATCH_SIZE * 10.
+        """
+        path = path or f"{node_label}_{node_property}.parquet"
+        page_size = page_size or BATCH_SIZE * 10
+        id_expression = f"n.{node_id_property}" if node_id_property else "elementId(n)"
+        query = f"""
+        MATCH (n:{node_label})
+        WHERE n.{node_property} IS NOT NULL
+        RETURN {id_expression} AS nodeId, n.{node_property} AS text, n.{node_property}_embedding AS embedding
+        """
+        schema = pa.schema([("nodeId", pa.string()), ("text", pa.string()), ("embedding", pa.list_(pa.float32()))])
+        exported = 0
+        with pq.ParquetWriter(path, schema, compression=COMPRESSION) as writer:
+            for page in self.connection_manager.stream(query, page_size=page_size):
+                embeddings = [decode_embedding(record["embedding"]) for record in page]
+                writer.write_table(pa.table({
+                    "nodeId": [str(record["nodeId"]) for record in page],
+                    "text": [record["text"] for record in page],
+                    "embedding": pa.array([None if embedding is None else embedding for embedding in embeddings], pa.list_(pa.float32())),
+                }, schema=schema))
+                exported += len(page)
+
+        print(f"Exported {exported} records to {path}")
+
+    def build_vector_store(self, node_label: str, node_property: str, node_id_property: str, nlist: int | None = None, parquet_path: str | None = None):
+        """
+        Builds the local vector store of the embeddings of a node property, so that similarity queries can be
+        answered in-process and go to the database only for metadata. Embeddings stored in any format
+        (see models.embedding_codec) are decoded.
+
+        Args:
+            node_label (str): The label of the nodes.
+            node_property (str): The property whose embeddings (`<node_property>_embedding`) are indexed.
+            node_id_property (str): The property used as node id, or an empty string to use the element id.
+                                    Books must use "title", which is the id the tools look up.
+            nlist (int, optional): The number of IVF lists. Defaults to the square root of the number of nodes.
+            parquet_path (str, optional): A file written by export_property_to_parquet with the same node id, to read
+                                          the embeddings from instead of the database.
+        """
+        path = os.path.join(env_loader.vector_store_path or "vector_store", f"{node_label}_{node_property}_embedding")
+        # The embeddings are streamed to the store page by page, never all of them in memory at once
+        if parquet_path:
+            pages = (
+                (frame["nodeId"].tolist(), np.stack(frame["embedding"].to_numpy()))
+                for frame in iter_frames(parquet_path, ["nodeId", "embedding"], pc.field("embedding").is_valid())
+            )
+            store = VectorStore.build_from_pages(path, pages, nlist)
+            print(f"Indexed {len(store)} embeddings in {path}")
+            return
+
         if node_id_property:
-            query = f"MATCH (n:{node_label}) WHERE n.{node_property} IS NOT NULL RETURN n.{node_id_property} as nodeId, n.{node_property} as text"
+            query = f"MATCH (n:{node_label}) WHERE n.{node_property}_embedding IS NOT NULL RETURN n.{node_id_property} as nodeId, n.{node_property}_embedding as embedding"
         else:
-            query = f"MATCH (n:{node_label}) WHERE n.{node_property} IS NOT NULL RETURN elementId(n) as nodeId, n.{node_property} as text"
-        data = self.fetch_data(query)
-        
-        output_file = f"{node_label}_{node_property}_texts.pkl"
-        with open(output_file, mode='wb') as file:
-            pickle.dump(data, file)
-        
-        print(f"Exported {len(data)} records to {output_file}")
+            query = f"MATCH (n:{node_label}) WHERE n.{node_property}_embedding IS NOT NULL RETURN elementId(n) as nodeId, n.{node_property}_embedding as embedding"
+        pages = (
+            ([record["nodeId"] for record in page], np.asarray([decode_embedding(record["embedding"]) for record in page], dtype=np.float32))
+            for page in self.connection_manager.stream(query, page_size=BATCH_SIZE * 10)
+        )
+        store = VectorStore.build_from_pages(path, pages, nlist)
+        print(f"Indexed {len(store)} embeddings in {path}")
+
+    def migrate_embeddings(self, node_label: str, node_property: str, node_id_property: str, storage: str, page_size: int | None = None):
+        """
+        Converts the stored `<node_property>_embedding` values of a label to another storage format, page by page.
+        Neo4j vector indexes only accept lists of floats, so when migrating to a binary format the vector index is
+        dropped and the local vector store is built in its place (VECTOR_STORE_PATH must be set), and when
+        migrating back to lists the vector index is created again.
+
+        Args:
+            node_label (str): The label of the nodes.
+            node_property (str): The encoded property.
+            node_id_property (str): The property used as node id by the local vector store, or an empty string to
+                                    use the element id (see build_vector_store).
+            storage (str): The target format: "list", "float32" or "int8".
+            page_size (int, optional): The number of nodes converted per page. Defaults to BATCH_SIZE * 10.
+        """
+        if storage != "list" and not env_loader.vector_store_path:
+            raise ValueError(f"Binary embeddings are searched in the local vector store, set VECTOR_STORE_PATH before migrating to {storage}")
+        page_size = page_size or BATCH_SIZE * 10
+        page_query = f"""
+        MATCH (n:{node_label})
+        WHERE n.{node_property}_embedding IS NOT NULL
+        RETURN elementId(n) AS nodeId, n.{node_property}_embedding AS embedding
+        """
+        total = self.connection_manager.read_single(
+            f"MATCH (n:{node_label}) WHERE n.{node_property}_embedding IS NOT NULL RETURN count(n) AS total"
+        )["total"]  # type: ignore
+        vector_dimension = 0
+
+        with tqdm(total=total, desc=f"Migrating {node_label}.{node_property}_embedding to {storage}") as pbar, EmbeddingWriter(
+            node_label, node_property, "", batch_size=BATCH_SIZE, workers=env_loader.embeddings_writers, storage=storage
+        ) as writer:
+            for page in self.connection_manager.stream(page_query, page_size=page_size):
+                embeddings = [(record["nodeId"], decode_embedding(record["embedding"])) for record in page]
+                vector_dimension = len(embeddings[0][1])  # type: ignore
+                writer.put(embeddings)
+                pbar.update(len(page))
+
+        if storage == "list":
+            if vector_dimension:
+                self.create_vector_index(node_label, f"{node_property}_embedding", vector_dimension)
+        else:
+            self.connection_manager.write(f"DROP INDEX {node_label}_{node_property}_embedding_index IF EXISTS")
+            if vector_dimension:
+                self.build_vector_store(node_label, node_property, node_id_property)
+
+    def build_review_aggregates(self, exemplars: int = 3, page_size: int | None = None):
+        """
+        Precomputes, for every book, a summary of the embeddings of its reviews (`Review.text_embedding`): their
+        mean and up to `exemplars` k-means centroids. Each one is stored as a `ReviewAggregate` node, linked to its
+        book with `AGGREGATES` and holding the book title, a key (`<title>#<n>`), the kind ("mean" or "exemplar")
+        and the number of reviews, and indexed like any other embedding (a Neo4j vector index, or the local vector store with binary
+        storage). recommendBooksByReviews searches them to pick candidate books instead of scanning every review.
+        Previous aggregates are replaced.
+
+        Args:
+            exemplars (int, optional): The maximum number of k-means exemplars per book. Defaults to 3.
+            page_size (int, optional): The number of reviews read per page; a book with more reviews is read
+                                       alone. Defaults to REVIEW_PAGE_SIZE.
+        """
+        page_size = page_size or REVIEW_PAGE_SIZE
+        deleted = None
+        while deleted != 0:
+            deleted = self.connection_manager.write(
+                "MATCH (a:ReviewAggregate) WITH a LIMIT $limit DETACH DELETE a RETURN count(*) AS deleted", {"limit": BATCH_SIZE}
+            )[0]["deleted"]
+
+        # Only the books and their number of reviews, read from the relationship counts
+        books_query = """
+        MATCH (b:Book)
+        RETURN elementId(b) AS bookId, b.title AS title, COUNT { (:Review)-[:REVIEWS]->(b) } AS reviews
+        """
+        total = self.connection_manager.read_single("MATCH (b:Book) RETURN count(b) AS total")["total"]  # type: ignore
+        vector_dimension = 0
+        aggregates = 0
+
+        with tqdm(total=total, desc="Aggregating review embeddings") as pbar:
+            for page in self.connection_manager.stream(books_query, page_size=BATCH_SIZE):
+                for books in self._review_batches(page, page_size):
+                    rows, vectors = self._write_review_aggregates(self._review_embeddings(books), exemplars)
+                    if rows:
+                        vector_dimension = vectors.shape[1]
+                    aggregates += len(rows)
+                pbar.update(len(page))
+                pbar.set_postfix(aggregates=aggregates)
+
+        if vector_dimension:
+            self._index_embeddings("ReviewAggregate", "text", "key", vector_dimension)
+
+    def update_review_aggregates(self, book_ids: list, exemplars: int = 3, page_size: int | None = None):
+        """
+        Recomputes the review aggregates of some books in place (see build_review_aggregates), after their reviews
+        changed. The local vector store of the aggregates, if built, is updated too.
+
+        Args:
+            book_ids (list): The element ids of the books.
+            exemplars (int, optional): The maximum number of k-means exemplars per book. Defaults to 3.
+            page_size (int, optional): The number of reviews read per page. Defaults to REVIEW_PAGE_SIZE.
+        """
+        page_size = page_size or REVIEW_PAGE_SIZE
+        books_query = """
+        MATCH (b:Book) WHERE elementId(b) IN $ids
+        RETURN elementId(b) AS bookId, b.title AS title, COUNT { (:Review)-[:REVIEWS]->(b) } AS reviews
+        """
+        delete_query = """
+        MATCH (a:ReviewAggregate)-[:AGGREGATES]->(b:Book) WHERE elementId(b) IN $ids
+        WITH a, a.key AS key
+        DETACH DELETE a
+        RETURN key
+        """
+        store = VectorStore.open("ReviewAggregate", "text_embedding")
+        for i in range(0, len(book_ids), BATCH_SIZE):
+            ids = book_ids[i:i + BATCH_SIZE]
+            removed = {record["key"] for record in self.connection_manager.write(delete_query, {"ids": ids})}
+            keys = set()
+            for books in self._review_batches(self.connection_manager.read(books_query, {"ids": ids}), page_size):
+                rows, vectors = self._write_review_aggregates(self._review_embeddings(books), exemplars)
+                keys.update(row["key"] for row in rows)
+                if store is not None:
+                    store.upsert([row["key"] for row in rows], vectors)
+            if store is not None:
+                store.remove(list(removed - keys))
+
+    @staticmethod
+    def _review_batches(books: list, page_size: int):
+        # Groups {bookId, title, reviews} records so that a batch has at most page_size reviews, or a single book
+        batch, reviews = [], 0
+        for book in books:
+            if not book["reviews"]:
+                continue
+            if batch and reviews + book["reviews"] > page_size:
+                yield batch
+                batch, reviews = [], 0
+            batch.append(book)
+            reviews += book["reviews"]
+        if batch:
+            yield batch
+
+    def _review_embeddings(self, books: list) -> list[tuple[dict, np.ndarray]]:
+        # Reads the review embeddings of a batch of books, streamed and decoded one by one so that only their
+        # float32 vectors are held
+        query = """
+        MATCH (r:Review)-[:REVIEWS]->(b:Book)
+        WHERE elementId(b) IN $ids AND r.text_embedding IS NOT NULL
+        RETURN elementId(b) AS bookId, r.text_embedding AS embedding
+        """
+        vectors = {book["bookId"]: [] for book in books}
+        for page in self.connection_manager.stream(query, {"ids": list(vectors)}):
+            for record in page:
+                vectors[record["bookId"]].append(decode_embedding(record["embedding"]))
+        return [(book, np.asarray(vectors[book["bookId"]], dtype=np.float32)) for book in books]
+
+    def _write_review_aggregates(self, books: list[tuple[dict, np.ndarray]], exemplars: int) -> tuple[list[dict], np.ndarray]:
+        # Summarizes and creates the aggregates of a batch of ({bookId, title}, review embeddings) pairs
+        write_query = """
+        UNWIND $rows AS row
+        MATCH (b:Book) WHERE elementId(b) = row.bookId
+        CREATE (a:ReviewAggregate {key: row.key, title: row.title, kind: row.kind, reviews: row.reviews, text_embedding: row.embedding})-[:AGGREGATES]->(b)
+        """
+        rows = []
+        vectors = []
+        for record, embeddings in books:
+            if not len(embeddings):
+                continue
+            summary = summarize(embeddings, exemplars)
+            for i, vector in enumerate(summary):
+                rows.append({
+                    "bookId": record["bookId"],
+                    "key": f"{record['title']}#{i}",
+                    "title": record["title"],
+                    "kind": "mean" if i == 0 else "exemplar",
+                    "reviews": len(embeddings),
+                    "embedding": encode_embedding(vector, env_loader.embeddings_storage),
+                })
+                vectors.append(vector)
+        if rows:
+            self.connection_manager.write(write_query, {"rows": rows})
+        return rows, np.asarray(vectors, dtype=np.float32)
 
     def create_vector_index(self, node_label: str, vector_property: str, vector_dimensions: int):
         query = f"""CREATE VECTOR INDEX {node_label}_{vector_property}_index IF NOT EXISTS FOR (n:{node_label}) ON (n.{vector_property}) OPTIONS {{ indexConfig: {{
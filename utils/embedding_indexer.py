@@ -0,0 +1,144 @@
+import time
+from models.embedding_manager import EmbeddingManager
+from models.vector_store import VectorStore
+from utils.connection_manager import ConnectionManager
+from utils.db_manager import DBManager
+from utils.embedding_writer import EmbeddingWriter, text_hash
+from utils.env_loader import EnvLoader
+
+
+class EmbeddingIndexer:
+    """
+    EmbeddingIndexer keeps the embeddings of a node property up to date after the initial backfill, encoding only
+    the nodes that need it: those without `<node_property>_embedding` and those whose text no longer matches the
+    hash stored in `<node_property>_embedding_hash`. Embeddings of nodes whose text was removed are removed too.
+
+    Changes are applied in place: the local vector store of the property, if built, is upserted, and for review
+    texts the review aggregates of the affected books are recomputed (see DBManager.update_review_aggregates).
+
+    Embeddings generated before hashes were stored are assumed to match their text and have their hash set on
+    the first pass, instead of being encoded again.
+
+    Methods:
+        run_once():
+    """
+
+    def __init__(self, node_label: str, node_property: str, node_id_property: str, page_size: int | None = None, batch_size: int = 32):
+        """
+        Args:
+            node_label (str): The label of the nodes.
+            node_property (str): The encoded property.
+            node_id_property (str): The property used as node id, or an empty string to use the element id.
+            page_size (int, optional): The number of nodes read, encoded and written per page. Defaults to BATCH_SIZE.
+            batch_size (int, optional): The maximum number of texts in an encoder batch. Defaults to 32.
+        """
+        env_loader = EnvLoader()
+        self.node_label = node_label
+        self.node_property = node_property
+        self.node_id_property = node_id_property
+        self.page_size = page_size or env_loader.batch_size
+        self.batch_size = batch_size
+        self.connection_manager = ConnectionManager()
+        self.embedding_manager = EmbeddingManager()
+        self.id_expression = f"n.{node_id_property}" if node_id_property else "elementId(n)"
+
+    def _stamp_legacy_hashes(self) -> int:
+        query = f"""
+        MATCH (n:{self.node_label})
+        WHERE n.{self.node_property} IS NOT NULL AND n.{self.node_property}_embedding IS NOT NULL
+          AND n.{self.node_property}_embedding_hash IS NULL
+        WITH n LIMIT $limit
+        SET n.{self.node_property}_embedding_hash = apoc.util.sha1([n.{self.node_property}])
+        RETURN count(n) AS stamped
+        """
+        stamped = 0
+        while True:
+            count = self.connection_manager.write(query, {"limit": self.page_size})[0]["stamped"]
+            stamped += count
+            if count == 0:
+                return stamped
+
+    def _remove_orphans(self) -> list:
+        query = f"""
+        MATCH (n:{self.node_label})
+        WHERE n.{self.node_property} IS NULL AND n.{self.node_property}_embedding IS NOT NULL
+        REMOVE n.{self.node_property}_embedding, n.{self.node_property}_embedding_hash
+        RETURN {self.id_expression} AS nodeId
+        """
+        return [record["nodeId"] for record in self.connection_manager.write(query)]
+
+    def _books_of(self, review_ids: list) -> list:
+        query = f"""
+        MATCH (n:{self.node_label})-[:REVIEWS]->(b:Book)
+        WHERE {self.id_expression} IN $ids
+        RETURN DISTINCT elementId(b) AS bookId
+        """
+        return [record["bookId"] for record in self.connection_manager.read(query, {"ids": review_ids})]
+
+    def _has_review_aggregates(self) -> bool:
+        # Aggregates are only maintained once DBManager.build_review_aggregates has built them for every book
+        return self.connection_manager.read_single("MATCH (a:ReviewAggregate) RETURN a.key AS key LIMIT 1") is not None
+
+    def run_once(self) -> dict:
+        """
+        Runs one indexing pass.
+
+        Returns:
+            dict: The nodes encoded and removed, the legacy hashes set, the books whose review aggregates were
+                  recomputed, the tokens encoded, the seconds of the pass and the nodes and tokens per second.
+        """
+        start = time.perf_counter()
+        stamped = self._stamp_legacy_hashes()
+        removed = self._remove_orphans()
+
+        # Read in a single streamed pass (see ConnectionManager.stream)
+        page_query = f"""
+        MATCH (n:{self.node_label})
+        WHERE n.{self.node_property} IS NOT NULL
+          AND (n.{self.node_property}_embedding IS NULL
+               OR n.{self.node_property}_embedding_hash <> apoc.util.sha1([n.{self.node_property}]))
+        RETURN {self.id_expression} AS nodeId, n.{self.node_property} AS text
+        """
+        store = VectorStore.open(self.node_label, f"{self.node_property}_embedding")
+        if store is not None and removed:
+            store.remove(removed)
+
+        env_loader = EnvLoader()
+        encoded = []
+        tokens = 0
+        with EmbeddingWriter(
+            self.node_label,
+            self.node_property,
+            self.node_id_property,
+            batch_size=env_loader.batch_size,
+            workers=env_loader.embeddings_writers,
+            queue_size=env_loader.embeddings_write_queue,
+            hashed=True,
+        ) as writer:
+            for page in self.connection_manager.stream(page_query, page_size=self.page_size):
+                node_ids = [record["nodeId"] for record in page]
+                texts = [record["text"] for record in page]
+                embeddings, stats = self.embedding_manager.generate_bulk_embeddings(texts, max_batch_size=self.batch_size)
+                tokens += stats["tokens"]
+                writer.put(list(zip(node_ids, embeddings, map(text_hash, texts))))
+                encoded += node_ids
+                # Appending rows does not copy the store, so each page is upserted and dropped
+                if store is not None:
+                    store.upsert(node_ids, embeddings)
+
+        books = []
+        if self.node_label == "Review" and self.node_property == "text" and (encoded or removed) and self._has_review_aggregates():
+            books = self._books_of(encoded + removed)
+            DBManager().update_review_aggregates(books)
+
+        seconds = time.perf_counter() - start
+        return {
+            "encoded": len(encoded),
+            "removed": len(removed),
+            "stamped": stamped,
+            "books": len(books),
+            "tokens": tokens,
+            "seconds": seconds,
+            "nodes_per_second": len(encoded) / seconds if seconds else 0.0,
+            "tokens_per_second": tokens / seconds if seconds else 0.0,
+        }
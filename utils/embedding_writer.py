@@ -0,0 +1,186 @@
+import hashlib
+import threading
+import time
+from queue import Queue
+from models.embedding_codec import encode_embedding
+from utils.connection_manager import ConnectionManager
+from utils.env_loader import EnvLoader
+
+
+def text_hash(text: str) -> str:
+    """
+    Returns the hash stored with an embedding: the SHA-1 hex digest of its text, the same value as
+    `apoc.util.sha1([text])` in Cypher.
+    """
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def embedding_write_query(node_label: str, node_property: str, node_id_property: str, hashed: bool = False) -> str:
+    """
+    Builds the query that writes a batch of `{nodeId, embedding}` rows to `<node_property>_embedding`. If hashed,
+    rows also have a `hash` of the encoded text, written to `<node_property>_embedding_hash`.
+    """
+    assignments = f"n.{node_property}_embedding = row.embedding"
+    if hashed:
+        assignments += f", n.{node_property}_embedding_hash = row.hash"
+    if node_id_property:
+        return f"""
+        UNWIND $batch AS row
+        MATCH (n:{node_label} {{{node_id_property}: row.nodeId}})
+        SET {assignments}
+        """
+    return f"""
+    UNWIND $batch AS row
+    MATCH (n:{node_label}) WHERE elementId(n) = row.nodeId
+    SET {assignments}
+    """
+
+
+class EmbeddingWriter:
+    """
+    EmbeddingWriter writes embeddings to the database from a pool of background threads, so that the encoder
+    keeps running while the previous chunks travel over the network.
+
+    The encoder puts chunks of `(node_id, embedding)` pairs in a bounded queue; when the queue is full `put`
+    blocks, which is the backpressure of the pipeline. Each writer thread drains the queue with `UNWIND` writes
+    of `batch_size` rows in explicit write transactions. Embeddings are encoded in the EMBEDDINGS_STORAGE format
+    (see models.embedding_codec). A hashed writer takes `(node_id, embedding, text_hash)` triples instead and also
+    stores the hash of the encoded text, which the incremental indexer compares to detect changed texts.
+
+    Methods:
+        put(embeddings: list, tag=None):
+
+        completed_tag():
+
+        stats():
+
+        close():
+    """
+
+    def __init__(
+        self,
+        node_label: str,
+        node_property: str,
+        node_id_property: str,
+        batch_size: int,
+        workers: int = 2,
+        queue_size: int = 8,
+        storage: str | None = None,
+        hashed: bool = False,
+    ):
+        """
+        Args:
+            node_label (str): The label of the nodes.
+            node_property (str): The encoded property; embeddings go to `<node_property>_embedding`.
+            node_id_property (str): The property used as node id, or an empty string to use the element id.
+            batch_size (int): The number of rows per write transaction.
+            workers (int, optional): The number of writer threads. Defaults to 2.
+            queue_size (int, optional): The maximum number of chunks waiting to be written. Defaults to 8.
+            storage (str, optional): The storage format of the embeddings. Defaults to EMBEDDINGS_STORAGE.
+            hashed (bool, optional): Whether chunks carry the hash of each text. Defaults to False.
+        """
+        self.connection_manager = ConnectionManager()
+        self.query = embedding_write_query(node_label, node_property, node_id_property, hashed)
+        self.hashed = hashed
+        self.batch_size = batch_size
+        self.storage = storage or EnvLoader().embeddings_storage
+        self.queue = Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._error = None
+        self._next_seq = 0
+        self._tags = {}
+        self._done = set()
+        self._completed_seq = -1
+        self.written = 0
+        self.write_time = 0.0
+        self.backpressure_time = 0.0
+        self.threads = [threading.Thread(target=self._run, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def put(self, embeddings: list, tag=None):
+        """
+        Queues a chunk of `(node_id, embedding)` pairs, or triples with the text hash if the writer is hashed,
+        blocking while the queue is full.
+
+        Args:
+            embeddings (list): The pairs to write.
+            tag (optional): A value returned by `completed_tag` once this chunk and every previous one are written,
+                            e.g. the number of nodes done.
+        """
+        self._raise_error()
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._tags[seq] = tag
+        start = time.perf_counter()
+        self.queue.put((seq, embeddings))
+        self.backpressure_time += time.perf_counter() - start
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            seq, embeddings = item
+            try:
+                if self._error is None:
+                    start = time.perf_counter()
+                    for i in range(0, len(embeddings), self.batch_size):
+                        batch = embeddings[i:i + self.batch_size]
+                        self.connection_manager.write(self.query, {"batch": [self._row(item) for item in batch]})
+                    with self._lock:
+                        self.write_time += time.perf_counter() - start
+                        self.written += len(embeddings)
+                        self._done.add(seq)
+                        while self._completed_seq + 1 in self._done:
+                            self._tags.pop(self._completed_seq, None)
+                            self._completed_seq += 1
+                            self._done.remove(self._completed_seq)
+            except Exception as e:
+                self._error = e
+
+    def _row(self, item: tuple) -> dict:
+        row = {"nodeId": item[0], "embedding": encode_embedding(item[1], self.storage)}
+        if self.hashed:
+            row["hash"] = item[2]
+        return row
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def completed_tag(self):
+        """
+        Returns the tag of the last chunk written with every previous chunk also written, or None.
+        """
+        with self._lock:
+            return self._tags.get(self._completed_seq)
+
+    def stats(self) -> dict:
+        """
+        Returns the chunks waiting in the queue, the embeddings written and the seconds spent writing
+        (summed over the threads) and blocked on a full queue.
+        """
+        return {
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "write_s": self.write_time,
+            "backpressure_s": self.backpressure_time,
+        }
+
+    def close(self):
+        """
+        Waits until every queued chunk is written and stops the threads. Raises the first write error, if any.
+        """
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self._raise_error()
@@ -11,6 +11,26 @@ class EnvLoader:
     batch_size = ""
     embeddings_model = ""
     agent_llm_model = ""
+    vector_store_path = ""
+    embeddings_max_tokens = ""
+    embeddings_batch_tokens = ""
+    embeddings_backend = ""
+    embeddings_storage = ""
+    embeddings_artifacts_path = ""
+    embeddings_workers = ""
+    embeddings_worker_threads = ""
+    embeddings_writers = ""
+    embeddings_write_queue = ""
+    embeddings_cache_size = ""
+    embeddings_cache_ttl = ""
+    embeddings_cache_path = ""
+    embeddings_cache_disk_size = ""
+    metadata_cache_size = ""
+    metadata_cache_warm = ""
+    neo4j_pool_size = ""
+    neo4j_max_retries = ""
+    neo4j_retry_delay = ""
+    neo4j_liveness_check_timeout = ""
 
     def __new__(cls):
         if cls._instance is None:
@@ -24,6 +44,26 @@ class EnvLoader:
             cls.batch_size = int(cls._instance.get_env_var("BATCH_SIZE", "100"))
             cls.embeddings_model = cls._instance.get_env_var("EMBEDDINGS_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
             cls.agent_llm_model = cls._instance.get_env_var("AGENT_LLM_MODEL", "llama3.3")
+            cls.vector_store_path = cls._instance.get_env_var("VECTOR_STORE_PATH", "")
+            cls.embeddings_max_tokens = int(cls._instance.get_env_var("EMBEDDINGS_MAX_TOKENS", "512"))
+            cls.embeddings_batch_tokens = int(cls._instance.get_env_var("EMBEDDINGS_BATCH_TOKENS", "8192"))
+            cls.embeddings_backend = cls._instance.get_env_var("EMBEDDINGS_BACKEND", "torch")
+            cls.embeddings_storage = cls._instance.get_env_var("EMBEDDINGS_STORAGE", "list")
+            cls.embeddings_artifacts_path = cls._instance.get_env_var("EMBEDDINGS_ARTIFACTS_PATH", "artifacts")
+            cls.embeddings_workers = int(cls._instance.get_env_var("EMBEDDINGS_WORKERS", "1"))
+            cls.embeddings_worker_threads = int(cls._instance.get_env_var("EMBEDDINGS_WORKER_THREADS", "0"))
+            cls.embeddings_writers = int(cls._instance.get_env_var("EMBEDDINGS_WRITERS", "2"))
+            cls.embeddings_write_queue = int(cls._instance.get_env_var("EMBEDDINGS_WRITE_QUEUE", "8"))
+            cls.embeddings_cache_size = int(cls._instance.get_env_var("EMBEDDINGS_CACHE_SIZE", "10000"))
+            cls.embeddings_cache_ttl = float(cls._instance.get_env_var("EMBEDDINGS_CACHE_TTL", "3600"))
+            cls.embeddings_cache_path = cls._instance.get_env_var("EMBEDDINGS_CACHE_PATH", "")
+            cls.embeddings_cache_disk_size = int(cls._instance.get_env_var("EMBEDDINGS_CACHE_DISK_SIZE", "100000"))
+            cls.metadata_cache_size = int(cls._instance.get_env_var("METADATA_CACHE_SIZE", "100000"))
+            cls.metadata_cache_warm = int(cls._instance.get_env_var("METADATA_CACHE_WARM", "0"))
+            cls.neo4j_pool_size = int(cls._instance.get_env_var("NEO4J_POOL_SIZE", "50"))
+            cls.neo4j_max_retries = int(cls._instance.get_env_var("NEO4J_MAX_RETRIES", "3"))
+            cls.neo4j_retry_delay = float(cls._instance.get_env_var("NEO4J_RETRY_DELAY", "0.5"))
+            cls.neo4j_liveness_check_timeout = float(cls._instance.get_env_var("NEO4J_LIVENESS_CHECK_TIMEOUT", "30"))
         return cls._instance
 
     @staticmethod
@@ -0,0 +1,64 @@
+'''
+Exporta el modelo de embeddings al backend optimizado indicado y comprueba que sus vectores
+coinciden con los ya guardados en la BBDD
+'''
+
+import os
+import sys
+import time
+import numpy as np
+from transformers import AutoTokenizer
+from utils.env_loader import EnvLoader
+from utils.db_manager import DBManager
+from models.embedding_codec import decode_embedding
+from models.embedding_backends import BACKENDS, OnnxBackend, QuantizedTorchBackend, artifact_dir
+from models.embedding_manager import EmbeddingManager
+
+env_loader = EnvLoader()
+
+
+def export(backend: str):
+    '''
+    Produces and caches the artifact of the backend in EMBEDDINGS_ARTIFACTS_PATH
+    '''
+    model_name = env_loader.embeddings_model
+    directory = artifact_dir(env_loader.embeddings_artifacts_path, model_name)
+    if backend == "torch-int8":
+        QuantizedTorchBackend.export(model_name, os.path.join(directory, "int8.pt"))
+    elif backend == "onnx":
+        OnnxBackend.export(model_name, os.path.join(directory, "model.onnx"), AutoTokenizer.from_pretrained(model_name))
+    print(f"Backend {backend} ready in {directory}")
+
+
+def check_parity(backend: str, sample: int, node_label: str = "Book", node_property: str = "description"):
+    '''
+    Encodes a sample of texts one by one, as queries are, with the backend and compares the vectors
+    with the fp32 embeddings stored in the database
+    '''
+    env_loader.embeddings_backend = backend
+    embedding_manager = EmbeddingManager()
+    query = f"""
+    MATCH (n:{node_label}) WHERE n.{node_property} IS NOT NULL AND n.{node_property}_embedding IS NOT NULL
+    RETURN n.{node_property} AS text, n.{node_property}_embedding AS embedding LIMIT {sample}
+    """
+    data = DBManager().fetch_data(query)
+
+    similarities = []
+    start = time.perf_counter()
+    for row in data:
+        embedding = np.asarray(embedding_manager.generate_text_embedding([row["text"]], use_cache=False)[0])
+        stored = decode_embedding(row["embedding"])
+        similarities.append(float(embedding @ stored / (np.linalg.norm(embedding) * np.linalg.norm(stored))))
+    elapsed = time.perf_counter() - start
+
+    print(f"Backend {backend}: {len(data)} {node_label}.{node_property} texts")
+    print(f"  latency per query: {elapsed / max(len(data), 1) * 1000:.1f} ms")
+    print(f"  cosine with stored vectors: mean {np.mean(similarities):.4f}, min {np.min(similarities):.4f}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3) or sys.argv[1] not in BACKENDS:
+        print(f'Usage: python export-embeddings-model.py <{"|".join(BACKENDS)}> [parity_sample]')
+        sys.exit(1)
+    export(sys.argv[1])
+    check_parity(sys.argv[1], int(sys.argv[2]) if len(sys.argv) == 3 else 100)
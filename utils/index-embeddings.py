@@ -0,0 +1,44 @@
+'''
+Mantiene los embeddings de la BBDD al día: codifica solo los nodos nuevos o cuyo texto ha cambiado.
+Con un intervalo se ejecuta como demonio, repitiendo la pasada cada N segundos
+'''
+
+import sys
+import time
+from utils.embedding_indexer import EmbeddingIndexer
+
+# (label, property, id property) of every stored embedding
+EMBEDDINGS = [
+    ("Book", "title", "title"),
+    ("Book", "description", "title"),
+    ("Review", "summary", ""),
+    ("Review", "text", ""),
+]
+
+
+def run_pass(indexers: list[EmbeddingIndexer]):
+    for indexer in indexers:
+        stats = indexer.run_once()
+        print(
+            f"{time.strftime('%Y-%m-%d %H:%M:%S')} {indexer.node_label}.{indexer.node_property}: "
+            f"{stats['encoded']} encoded, {stats['removed']} removed, {stats['stamped']} hashes set, "
+            f"{stats['books']} books re-aggregated in {stats['seconds']:.1f}s "
+            f"({stats['nodes_per_second']:.1f} nodes/s, {stats['tokens_per_second']:.0f} tokens/s)",
+            flush=True,
+        )
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:
+        print('Usage: python index-embeddings.py [interval_seconds]')
+        sys.exit(1)
+    interval = float(sys.argv[1]) if len(sys.argv) == 2 else 0
+    indexers = [EmbeddingIndexer(*embedding) for embedding in EMBEDDINGS]
+    try:
+        while True:
+            run_pass(indexers)
+            if not interval:
+                break
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
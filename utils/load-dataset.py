@@ -0,0 +1,19 @@
+'''
+Carga el dataset en la BBDD en paralelo, sustituyendo a utils/load.cypher.
+Con un directorio como tercer argumento, genera en su lugar los CSV de `neo4j-admin database import`
+y el fichero `post-import.cypher` con el esquema que la importación no crea.
+'''
+
+import sys
+from utils.bulk_loader import BulkLoader
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (3, 4):
+        print('Usage: python load-dataset.py <books_csv> <ratings_csv> [admin_csv_directory]')
+        sys.exit(1)
+    loader = BulkLoader()
+    loader.read(sys.argv[1], sys.argv[2])
+    if len(sys.argv) == 4:
+        loader.export_admin_csv(sys.argv[3])
+    else:
+        loader.load()
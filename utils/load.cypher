@@ -76,4 +76,9 @@ CREATE INDEX IF NOT EXISTS FOR (b:Book) ON (b.title);
 CREATE INDEX IF NOT EXISTS FOR (u:User) ON (u.userId);
 CREATE INDEX IF NOT EXISTS FOR (a:Author) ON (a.name);
 CREATE INDEX IF NOT EXISTS FOR (p:Publisher) ON (p.name);
-CREATE INDEX IF NOT EXISTS FOR (g:Genre) ON (g.name);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS FOR (g:Genre) ON (g.name);
+CREATE FULLTEXT INDEX book_title_fulltext IF NOT EXISTS FOR (b:Book) ON EACH [b.title];
+
+// Invalida las cachés de los datos leídos de la BBDD (ver utils/bulk_loader.py)
+MERGE (d:Dataset {name: "books"})
+SET d.generation = coalesce(d.generation, 0) + 1;
@@ -0,0 +1,250 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from utils.connection_manager import ConnectionManager
+
+# The generation of the dataset, bumped by every load (see utils/bulk_loader.py and utils/load.cypher)
+DATASET_GENERATION_QUERY = 'MATCH (d:Dataset {name: "books"}) RETURN d.generation AS generation'
+
+# Every field of a book in one row per book, the lists collected by subqueries so that rows are not multiplied
+BOOK_FIELDS = """
+RETURN b.title AS title,
+       b.description AS description,
+       b.publishedDate AS published,
+       b.ratingsCount AS ratingsCount,
+       b.image AS imageUrl,
+       COLLECT { MATCH (b)-[:WRITTEN_BY]->(a:Author) RETURN a.name } AS authors,
+       COLLECT { MATCH (b)-[:BELONGS_TO]->(g:Genre) RETURN g.name } AS genres,
+       COLLECT { MATCH (b)-[:PUBLISHED_BY]->(p:Publisher) RETURN p.name } AS publishers
+"""
+
+BOOKS_QUERY = """
+UNWIND $books AS title
+MATCH (b:Book {title: title})
+""" + BOOK_FIELDS
+
+# The most rated books first, the ones the agent is most likely to be asked about
+HOTTEST_BOOKS_QUERY = """
+MATCH (b:Book)
+WITH b ORDER BY coalesce(b.ratingsCount, 0) DESC LIMIT $limit
+""" + BOOK_FIELDS
+
+
+# Called when a cache finds that the dataset has been reloaded, so that other caches of its data are dropped too
+_generation_listeners: list = []
+
+
+def on_generation_change(callback):
+    """
+    Registers a function, called without arguments whenever MetadataCache or TitleResolver find a new dataset
+    generation.
+    """
+    _generation_listeners.append(callback)
+
+
+def notify_generation_change():
+    for callback in list(_generation_listeners):
+        callback()
+
+
+def dataset_generation(connection_manager: ConnectionManager):
+    """
+    Returns the generation of the dataset, None if it was loaded before generations were recorded.
+    """
+    record = connection_manager.read_single(DATASET_GENERATION_QUERY)
+    return record["generation"] if record is not None else None
+
+
+class BookRecord:
+    """
+    The metadata of a book. Records use slots instead of a dict, and titles, authors, genres, publishers and
+    dates are interned, so that the names shared by many books are stored once.
+    """
+
+    __slots__ = ("title", "description", "published", "ratings_count", "image_url", "authors", "genres", "publishers")
+
+    def __init__(self, record):
+        self.title = sys.intern(record["title"])
+        self.description = record["description"]
+        self.published = _intern(record["published"])
+        self.ratings_count = record["ratingsCount"]
+        self.image_url = record["imageUrl"]
+        self.authors = tuple(map(sys.intern, record["authors"]))
+        self.genres = tuple(map(sys.intern, record["genres"]))
+        self.publishers = tuple(map(sys.intern, record["publishers"]))
+
+    def card(self) -> dict:
+        """
+        Returns the record as the card returned by the tools.
+        """
+        return {
+            "title": self.title,
+            "description": self.description,
+            "published": self.published,
+            "ratingsCount": self.ratings_count,
+            "imageUrl": self.image_url,
+            "authors": list(self.authors),
+            "genres": list(self.genres),
+            "publishers": list(self.publishers),
+        }
+
+
+def _intern(value: str | None) -> str | None:
+    return sys.intern(value) if value is not None else None
+
+
+class MetadataCache:
+    """
+    MetadataCache keeps the metadata of books in memory, so that the static facts the tools look up (authors,
+    genres, publishers, descriptions...) do not go to Neo4j on every call.
+
+    Books are read through in a single query per lookup for the titles not cached, or warmed in bulk with the
+    most rated books. The cache is bounded with LRU eviction, and titles not in the database are cached too.
+    Everything is dropped when the dataset generation written by the loader changes, which is checked at most
+    every `check_interval` seconds.
+
+    Methods:
+        get(titles: list[str]):
+
+        warm(limit: int | None = None):
+
+        stats():
+
+        memory_bytes():
+
+        clear():
+    """
+
+    def __init__(self, max_size: int = 100000, check_interval: float = 5.0):
+        """
+        Args:
+            max_size (int, optional): The maximum number of books kept. Defaults to 100000.
+            check_interval (float, optional): The seconds between checks of the dataset generation. Defaults to 5.
+        """
+        self.max_size = max_size
+        self.check_interval = check_interval
+        self.connection_manager = ConnectionManager()
+        self._entries: OrderedDict[str, BookRecord | None] = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = None
+        self._checked = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_generation(self):
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return
+        checked = self._checked
+        generation = dataset_generation(self.connection_manager)
+        with self._lock:
+            changed = generation != self._generation
+            if changed:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._generation = generation
+            self._checked = now
+        # The first check only records the generation
+        if changed and checked:
+            notify_generation_change()
+
+    def _store(self, title: str, record: BookRecord | None):
+        self._entries[title] = record
+        self._entries.move_to_end(title)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, titles: list[str]) -> dict[str, BookRecord | None]:
+        """
+        Returns the record of every title, None for titles not found, querying in a single round trip only the
+        titles that are not cached.
+        """
+        self._check_generation()
+        found = {}
+        with self._lock:
+            for title in titles:
+                if title in self._entries:
+                    self._entries.move_to_end(title)
+                    found[title] = self._entries[title]
+                    self.hits += 1
+        missing = list(dict.fromkeys(title for title in titles if title not in found))
+        if missing:
+            records = {record["title"]: BookRecord(record) for record in self.connection_manager.read(BOOKS_QUERY, {"books": missing})}
+            with self._lock:
+                self.misses += len(missing)
+                for title in missing:
+                    found[title] = records.get(title)
+                    self._store(title, found[title])
+        return {title: found[title] for title in titles}
+
+    def warm(self, limit: int | None = None) -> int:
+        """
+        Fills the cache with the most rated books in a single query.
+
+        Args:
+            limit (int, optional): The number of books read. Defaults to max_size.
+
+        Returns:
+            int: The number of books read.
+        """
+        self._check_generation()
+        records = self.connection_manager.read(HOTTEST_BOOKS_QUERY, {"limit": min(limit or self.max_size, self.max_size)})
+        with self._lock:
+            # The least rated are stored first, so that they are the first evicted
+            for record in reversed(records):
+                self._store(record["title"], BookRecord(record))
+        return len(records)
+
+    def memory_bytes(self) -> int:
+        """
+        Measures the memory held by the cache: the table, the records and every object they reference, counting
+        the objects shared between records (e.g. interned names) once.
+        """
+        with self._lock:
+            entries = list(self._entries.items())
+            size = sys.getsizeof(self._entries)
+        seen = set()
+
+        def measure(value) -> int:
+            if value is None or id(value) in seen:
+                return 0
+            seen.add(id(value))
+            total = sys.getsizeof(value)
+            if isinstance(value, tuple):
+                total += sum(measure(item) for item in value)
+            elif isinstance(value, BookRecord):
+                total += sum(measure(getattr(value, slot)) for slot in BookRecord.__slots__)
+            return total
+
+        for title, record in entries:
+            size += measure(title) + measure(record)
+        return size
+
+    def stats(self) -> dict:
+        """
+        Returns the size of the cache, its hit, miss, eviction and invalidation counters and its memory in bytes.
+        """
+        memory = self.memory_bytes()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_bytes": memory,
+            }
+
+    def clear(self):
+        """
+        Empties the cache.
+        """
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,30 @@
+'''
+Convierte los embeddings guardados en la BBDD al formato de almacenamiento indicado
+'''
+
+import sys
+from utils.db_manager import DBManager
+from models.embedding_codec import STORAGES
+from utils.env_loader import EnvLoader
+
+# (label, property, id property) of every stored embedding, the id being the one the local vector store is keyed by
+EMBEDDINGS = [
+    ("Book", "title", "title"),
+    ("Book", "description", "title"),
+    ("Review", "summary", ""),
+    ("Review", "text", ""),
+    ("ReviewAggregate", "text", "key"),
+]
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2 or sys.argv[1] not in STORAGES:
+        print(f'Usage: python migrate-embeddings.py <{"|".join(STORAGES)}>')
+        sys.exit(1)
+    # Neo4j cannot search binary embeddings, they are indexed by the local vector store
+    if sys.argv[1] != "list" and not EnvLoader().vector_store_path:
+        print(f'Set VECTOR_STORE_PATH in the .env file before migrating to {sys.argv[1]}')
+        sys.exit(1)
+    db_manager = DBManager()
+    for node_label, node_property, node_id_property in EMBEDDINGS:
+        db_manager.migrate_embeddings(node_label, node_property, node_id_property, sys.argv[1])
+    print(f'Embeddings migrated to {sys.argv[1]}. Set EMBEDDINGS_STORAGE={sys.argv[1]} in the .env file')
@@ -0,0 +1,137 @@
+import os
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+COMPRESSION = "zstd"
+ROW_GROUP_SIZE = 100_000
+
+BOOKS_SCHEMA = pa.schema([
+    ("Title", pa.string()),
+    ("description", pa.string()),
+    ("authors", pa.string()),
+    ("image", pa.string()),
+    ("previewLink", pa.string()),
+    ("publisher", pa.string()),
+    ("publishedDate", pa.string()),
+    ("infoLink", pa.string()),
+    ("categories", pa.string()),
+    ("ratingsCount", pa.int64()),
+])
+
+RATINGS_SCHEMA = pa.schema([
+    ("Id", pa.string()),
+    ("Title", pa.string()),
+    ("Price", pa.float64()),
+    ("User_id", pa.string()),
+    ("profileName", pa.string()),
+    ("review/helpfulness", pa.string()),
+    ("review/score", pa.float64()),
+    ("review/time", pa.int64()),
+    ("review/summary", pa.string()),
+    ("review/text", pa.string()),
+])
+
+# Key columns, stripped and with empty values as nulls, so that they can be filtered exactly
+KEY_COLUMNS = ("Title", "User_id")
+
+
+def is_parquet(path: str) -> bool:
+    return path.endswith(".parquet")
+
+
+def parquet_path(path: str) -> str:
+    """
+    Returns the Parquet file that goes with a CSV file: the same path with the .parquet extension.
+    """
+    return os.path.splitext(path)[0] + ".parquet"
+
+
+def reduced_path(path: str) -> str:
+    """
+    Returns the path of the reduced version of a dataset file, named with _reduced.
+    """
+    root, extension = os.path.splitext(path)
+    return f"{root}_reduced{extension}"
+
+
+def convert_csv(csv_path: str, schema: pa.Schema, output_path: str | None = None) -> dict:
+    """
+    Converts a dataset CSV file, already cleaned by data/dataset_corrections.py, to a typed, zstd-compressed
+    Parquet file with row groups of ROW_GROUP_SIZE rows. The file is streamed, so memory does not depend on its
+    size. Empty values become nulls, key columns are stripped and rows that cannot be parsed are skipped.
+
+    Args:
+        csv_path (str): The CSV file.
+        schema (pa.Schema): BOOKS_SCHEMA or RATINGS_SCHEMA.
+        output_path (str, optional): The Parquet file. Defaults to the CSV path with the .parquet extension.
+
+    Returns:
+        dict: The rows written and skipped and the seconds of the conversion.
+    """
+    output_path = output_path or parquet_path(csv_path)
+    skipped = 0
+
+    def skip(row):
+        nonlocal skipped
+        skipped += 1
+        return "skip"
+
+    start = time.perf_counter()
+    rows = 0
+    reader = pacsv.open_csv(
+        csv_path,
+        read_options=pacsv.ReadOptions(block_size=64 * 1024 * 1024),
+        parse_options=pacsv.ParseOptions(newlines_in_values=True, invalid_row_handler=skip),
+        # Numbers are parsed as float64 and cast afterwards, since the CSV files write counts as "3.0"
+        convert_options=pacsv.ConvertOptions(
+            column_types={field.name: pa.float64() if pa.types.is_integer(field.type) else field.type for field in schema},
+            strings_can_be_null=True,
+        ),
+    )
+    with pq.ParquetWriter(output_path, schema, compression=COMPRESSION) as writer:
+        for batch in reader:
+            columns = []
+            for field in schema:
+                column = batch.column(field.name)
+                if field.name in KEY_COLUMNS:
+                    column = pc.utf8_trim_whitespace(column)
+                    column = pc.if_else(pc.equal(column, ""), pa.scalar(None, pa.string()), column)
+                columns.append(column.cast(field.type))
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema), row_group_size=ROW_GROUP_SIZE)
+            rows += batch.num_rows
+    return {"rows": rows, "skipped": skipped, "seconds": time.perf_counter() - start}
+
+
+def _to_pandas(data) -> pd.DataFrame:
+    # Nullable integers, so that counts with nulls are not turned into floats
+    return data.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+
+
+def read_frame(path: str, columns: list[str] | None = None, filter: pc.Expression | None = None) -> pd.DataFrame:
+    """
+    Reads a Parquet file into a DataFrame, reading only the given columns and the row groups that can match
+    the filter (e.g. `pc.field("User_id").is_valid()`).
+    """
+    return _to_pandas(pq.read_table(path, columns=columns, filters=filter))
+
+
+def iter_frames(path: str, columns: list[str] | None = None, filter: pc.Expression | None = None, batch_size: int = ROW_GROUP_SIZE):
+    """
+    Streams a Parquet file as DataFrames of up to batch_size rows, with the same projection and filter as
+    read_frame.
+    """
+    for batch in ds.dataset(path, format="parquet").to_batches(columns=columns, filter=filter, batch_size=batch_size):
+        if batch.num_rows:
+            yield _to_pandas(batch)
+
+
+def frame_to_table(frame: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    """
+    Converts a DataFrame read as strings back to a typed table of the schema, with empty strings as nulls.
+    """
+    return pa.Table.from_pandas(frame.replace("", None), preserve_index=False).cast(schema)
@@ -2,47 +2,149 @@
 Reduce el tamaño del dataset
 '''
 
+import argparse
+import random
+from collections import Counter
 import pandas as pd
-import sys
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from utils.env_loader import EnvLoader
+from utils.parquet_dataset import BOOKS_SCHEMA, COMPRESSION, RATINGS_SCHEMA, frame_to_table, is_parquet, iter_frames, reduced_path
 
 env_loader = EnvLoader()
 books_path = env_loader.books_path
 ratings_path = env_loader.ratings_path
 
+# Rows read at a time, so that memory does not depend on the size of the files
+CHUNK_SIZE = 100_000
+
+# The writer of the reduced Parquet ratings, which are written chunk by chunk
+ratings_writer = None
+
+
+def read_chunks(path: str, filter: pc.Expression | None = None):
+    # Strings as they are, so that the reduced files are written back unchanged. Parquet files (see
+    # utils/parquet_dataset.py) apply the filter while reading
+    if is_parquet(path):
+        return (chunk.astype('string').fillna('') for chunk in iter_frames(path, filter=filter, batch_size=CHUNK_SIZE))
+    return pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=CHUNK_SIZE)
+
 def read_books():
-    return pd.read_csv(books_path)
+    return read_chunks(books_path)
 
 def write_books(books_df):
-    books_df.to_csv(books_path.replace('.csv', '_reduced.csv'), index=False)
+    if is_parquet(books_path):
+        pq.write_table(frame_to_table(books_df, BOOKS_SCHEMA), reduced_path(books_path), compression=COMPRESSION)
+    else:
+        books_df.to_csv(reduced_path(books_path), index=False)
 
-def read_ratings():
-    return pd.read_csv(ratings_path)
+def read_ratings(titles: set):
+    return read_chunks(ratings_path, pc.field('Title').isin(list(titles)))
 
-def write_ratings(ratings_df):
-    ratings_df.to_csv(ratings_path.replace('.csv', '_reduced.csv'), index=False)
+def write_ratings(ratings_df, header: bool):
+    global ratings_writer
+    if is_parquet(ratings_path):
+        if header:
+            ratings_writer = pq.ParquetWriter(reduced_path(ratings_path), RATINGS_SCHEMA, compression=COMPRESSION)
+        ratings_writer.write_table(frame_to_table(ratings_df, RATINGS_SCHEMA))  # type: ignore
+    else:
+        ratings_df.to_csv(reduced_path(ratings_path), index=False, mode='w' if header else 'a', header=header)
 
-def reduce_dataset(books: int):
+def stratum(book) -> tuple[str, int]:
+    '''
+    The stratum of a book: its first genre and the order of magnitude of its ratingsCount
+    (0 for none, 1 for 1-9, 2 for 10-99...)
     '''
-    Reduces the dataset to the first 'books' books
-    Produces the new files named with _reduced
+    genre = book.categories.strip("[]").split(",")[0].strip()
+    try:
+        ratings = int(float(book.ratingsCount))
+    except ValueError:
+        ratings = 0
+    return genre, len(str(ratings)) if ratings > 0 else 0
+
+def allocate(sizes: Counter, books: int) -> dict:
+    '''
+    Splits the sample among the strata in proportion to their sizes, by largest remainder
+    '''
+    total = sum(sizes.values())
+    quotas = {key: books * size / total for key, size in sizes.items()}
+    allocation = {key: int(quota) for key, quota in quotas.items()}
+    remaining = min(books, total) - sum(allocation.values())
+    for key in sorted(quotas, key=lambda key: quotas[key] - allocation[key], reverse=True)[:remaining]:
+        allocation[key] += 1
+    return allocation
+
+def sample_books(books: int, stratify: bool, rng: random.Random) -> pd.DataFrame:
     '''
-    
-    # Get first books
-    books_df = read_books()
-    books_df = books_df.sample(n=books, random_state=1)
+    Reservoir-samples the books in a single pass, or in two if stratified: the first counts the strata
+    and the second keeps a reservoir per stratum, sized in proportion to it
+    '''
+    columns = None
+    allocation = None
+    if stratify:
+        sizes = Counter()
+        for chunk in read_books():
+            chunk = chunk[chunk['Title'].str.strip() != '']
+            sizes.update(stratum(book) for book in chunk.itertuples(index=False))
+        allocation = allocate(sizes, books)
+
+    reservoirs = {}
+    seen = Counter()
+    for chunk in read_books():
+        columns = chunk.columns
+        chunk = chunk[chunk['Title'].str.strip() != '']
+        for book in chunk.itertuples(index=False):
+            key = stratum(book) if stratify else None
+            size = allocation[key] if allocation is not None else books
+            reservoir = reservoirs.setdefault(key, [])
+            seen[key] += 1
+            # Algorithm R: the n-th book replaces a random one with probability size / n
+            if len(reservoir) < size:
+                reservoir.append(book)
+            else:
+                position = rng.randrange(seen[key])
+                if position < size:
+                    reservoir[position] = book
+
+    return pd.DataFrame([book for reservoir in reservoirs.values() for book in reservoir], columns=columns)
+
+def reduce_dataset(books: int, stratify: bool = False, max_reviews: int | None = None):
+    '''
+    Reduces the dataset to a random sample of 'books' books, optionally stratified by genre and
+    ratingsCount, and their reviews, optionally at most 'max_reviews' per book (the first ones in the file).
+    Both files are streamed in chunks, so memory depends on the sample, not on the size of the dataset.
+    Produces the new files named with _reduced, which load with utils/load-dataset.py
+    '''
+    rng = random.Random(1)
+    books_df = sample_books(books, stratify, rng)
     write_books(books_df)
     print("Libros seleccionados y CSV creado.")
-    
-    # Get ratings for those books
-    ratings_df = read_ratings()
-    ratings_df = ratings_df[ratings_df['Title'].isin(books_df['Title'])]
-    write_ratings(ratings_df)
+
+    # Stream the ratings against the set of chosen titles
+    titles = set(books_df['Title'].str.strip())
+    reviews = Counter()
+    written = 0
+    header = True
+    for chunk in read_ratings(titles):
+        chunk = chunk[chunk['Title'].str.strip().isin(titles)]
+        if max_reviews is not None:
+            keep = []
+            for title in chunk['Title'].str.strip():
+                reviews[title] += 1
+                keep.append(reviews[title] <= max_reviews)
+            chunk = chunk[keep]
+        write_ratings(chunk, header)
+        header = False
+        written += len(chunk)
+    if ratings_writer is not None:
+        ratings_writer.close()
     print("Reseñas seleccionadas y CSV creado.")
-    print(f'Dataset reduced to {books} books')
-    
+    print(f'Dataset reduced to {len(books_df)} books and {written} reviews')
+
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print('Usage: python reduce-dataset.py <books>')
-        sys.exit(1)
-    reduce_dataset(int(sys.argv[1]))
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Reduce el tamaño del dataset')
+    parser.add_argument('books', type=int, help='number of books to keep')
+    parser.add_argument('--stratify', action='store_true', help='sample in proportion to genre and ratingsCount')
+    parser.add_argument('--max-reviews', type=int, default=None, help='maximum reviews kept per book')
+    args = parser.parse_args()
+    reduce_dataset(args.books, args.stratify, args.max_reviews)
@@ -0,0 +1,208 @@
+import re
+import threading
+import time
+import unicodedata
+from typing import NamedTuple
+import numpy as np
+from utils.connection_manager import ConnectionManager
+from utils.metadata_cache import dataset_generation, notify_generation_change
+
+# The Neo4j full-text index on the book titles, created by utils/bulk_loader.py and utils/load.cypher
+FULLTEXT_INDEX = "book_title_fulltext"
+
+# The lowest confidence with which a title is resolved
+MIN_CONFIDENCE = 0.6
+
+# Full-text matches are never taken as certain, since Lucene scores are not comparable between queries
+FULLTEXT_CONFIDENCE = 0.8
+
+_NOT_ALPHANUMERIC = re.compile(r"[\W_]+")
+
+
+class Resolution(NamedTuple):
+    """
+    The book a string was resolved to: its canonical title (None if unresolved), the confidence, from 0 to 1,
+    and the method that resolved it ("exact", "normalized", "trigram" or "fulltext").
+    """
+
+    title: str | None
+    confidence: float
+    method: str | None
+
+
+def normalize(title: str) -> str:
+    """
+    Normalizes a title for matching: accents and punctuation are removed, the case is folded and whitespace is
+    collapsed.
+    """
+    text = unicodedata.normalize("NFKD", title)
+    text = "".join(char for char in text if not unicodedata.combining(char)).casefold()
+    return _NOT_ALPHANUMERIC.sub(" ", text).strip()
+
+
+def trigrams(key: str) -> set[str]:
+    """
+    Returns the trigrams of a normalized title, padded so that the beginning and end of words count.
+    """
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _TitleIndex:
+    """
+    The indexes built from every title, replaced as a whole when the dataset changes so that lookups running
+    concurrently never see a partial index.
+    """
+
+    __slots__ = ("titles", "exact", "normalized", "postings", "sizes", "max_length")
+
+    def __init__(self, titles: list[str]):
+        normalized = {}
+        postings = {}
+        sizes = np.zeros(len(titles), dtype=np.int32)
+        for i, title in enumerate(titles):
+            key = normalize(title)
+            # The first title wins when several normalize to the same key
+            if key:
+                normalized.setdefault(key, title)
+            grams = trigrams(key)
+            sizes[i] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self.titles = titles
+        self.exact = set(titles)
+        self.normalized = normalized
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self.sizes = sizes
+        self.max_length = max(map(len, normalized), default=0)
+
+
+class TitleResolver:
+    """
+    TitleResolver resolves the titles written by the user or the LLM, which are often miscased, unaccented or
+    paraphrased, to the canonical `Book.title`, so that the tools do not answer "Book not found" and the agent
+    does not spend a ReAct iteration retrying.
+
+    A string is looked up, in order, as an exact title, in a hash map of normalized titles, in an in-memory
+    trigram index (scored by Dice similarity) and in the Neo4j full-text index of the titles. The indexes are
+    built from every title on first use and rebuilt when the dataset generation written by the loaders changes.
+
+    Methods:
+        resolve(title: str, min_confidence: float = MIN_CONFIDENCE, fuzzy: bool = True):
+
+        stats():
+    """
+
+    def __init__(self, check_interval: float = 5.0):
+        """
+        Args:
+            check_interval (float, optional): The seconds between checks of the dataset generation. Defaults to 5.
+        """
+        self.check_interval = check_interval
+        self.connection_manager = ConnectionManager()
+        self._lock = threading.Lock()
+        self._generation = None
+        self._checked = 0.0
+        self._index: _TitleIndex | None = None
+        self._counts = {"exact": 0, "normalized": 0, "trigram": 0, "fulltext": 0, "unresolved": 0}
+        self._seconds = 0.0
+
+    def _refresh(self) -> _TitleIndex:
+        now = time.monotonic()
+        index = self._index
+        if index is not None and now - self._checked < self.check_interval:
+            return index
+        with self._lock:
+            generation = dataset_generation(self.connection_manager)
+            changed = self._index is not None and generation != self._generation
+            if self._index is None or changed:
+                titles = [record["title"] for record in self.connection_manager.read("MATCH (b:Book) RETURN b.title AS title")]
+                self._index = _TitleIndex(titles)
+                self._generation = generation
+            self._checked = now
+            index = self._index
+        if changed:
+            notify_generation_change()
+        return index
+
+    @staticmethod
+    def _trigram(index: _TitleIndex, key: str) -> Resolution:
+        grams = trigrams(key)
+        lists = [index.postings[gram] for gram in grams if gram in index.postings]
+        if not lists:
+            return Resolution(None, 0.0, None)
+        shared = np.bincount(np.concatenate(lists), minlength=len(index.titles))
+        dice = 2 * shared / (len(grams) + index.sizes)
+        best = int(np.argmax(dice))
+        return Resolution(index.titles[best], float(dice[best]), "trigram")
+
+    def _fulltext(self, key: str) -> Resolution:
+        words = key.split()
+        query = """
+        CALL db.index.fulltext.queryNodes($index, $query) YIELD node, score
+        RETURN node.title AS title
+        LIMIT 1
+        """
+        try:
+            # Normalized words have no Lucene syntax; each one matches with up to one edit
+            record = self.connection_manager.read_single(query, {"index": FULLTEXT_INDEX, "query": " ".join(f"{word}~1" for word in words)})
+        except Exception:
+            # The full-text index has not been created
+            return Resolution(None, 0.0, None)
+        if record is None:
+            return Resolution(None, 0.0, None)
+        title_words = set(normalize(record["title"]).split())
+        coverage = sum(word in title_words for word in words) / len(words)
+        return Resolution(record["title"], FULLTEXT_CONFIDENCE * coverage, "fulltext")
+
+    def resolve(self, title: str, min_confidence: float = MIN_CONFIDENCE, fuzzy: bool = True) -> Resolution:
+        """
+        Resolves a string to the title of a book.
+
+        Args:
+            title (str): The string, e.g. a title written by the LLM.
+            min_confidence (float, optional): The lowest confidence accepted. Defaults to MIN_CONFIDENCE.
+            fuzzy (bool, optional): Whether to try the trigram and full-text lookups. Without them only exact and
+                                    normalized matches are returned, for strings that may not be titles at all;
+                                    those that match nothing are not counted in the stats. Defaults to True.
+
+        Returns:
+            Resolution: The canonical title, confidence and method, or a title of None if no book matches with
+                        at least min_confidence.
+        """
+        index = self._refresh()
+        start = time.perf_counter()
+        resolution = Resolution(None, 0.0, None)
+        key = normalize(title)
+        if title in index.exact:
+            resolution = Resolution(title, 1.0, "exact")
+        elif key in index.normalized:
+            resolution = Resolution(index.normalized[key], 1.0, "normalized")
+        # Longer strings are descriptions or questions, not titles
+        elif fuzzy and key and len(key) <= 2 * index.max_length:
+            resolution = self._trigram(index, key)
+            if resolution.confidence < min_confidence:
+                resolution = max(resolution, self._fulltext(key), key=lambda candidate: candidate.confidence)
+            if resolution.confidence < min_confidence:
+                resolution = Resolution(None, resolution.confidence, None)
+
+        if fuzzy or resolution.title is not None:
+            with self._lock:
+                self._counts[resolution.method or "unresolved"] += 1
+                self._seconds += time.perf_counter() - start
+        return resolution
+
+    def stats(self) -> dict:
+        """
+        Returns the lookups resolved by each method, the unresolved ones, the mean milliseconds per lookup (not
+        counting index builds) and the agent retries saved: the lookups that an exact match would have answered
+        with "Book not found".
+        """
+        with self._lock:
+            lookups = sum(self._counts.values())
+            return {
+                **self._counts,
+                "lookups": lookups,
+                "retries_saved": self._counts["normalized"] + self._counts["trigram"] + self._counts["fulltext"],
+                "mean_ms": self._seconds / lookups * 1000 if lookups else 0.0,
+            }
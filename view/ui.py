@@ -1,20 +1,63 @@
 from agents.rag_agent import RagAgent
 from utils.env_loader import EnvLoader
+from utils.connection_manager import ConnectionManager
+from models.embedding_manager import EmbeddingManager
 import streamlit as st
 from models.transcript_manager import TranscriptManager
 
+# Recursos del proceso: se crean una sola vez y se comparten entre reejecuciones y sesiones
+
+@st.cache_resource
+def get_rag_agent(model_name: str) -> RagAgent:
+    return RagAgent(model_name)
+
+@st.cache_resource
+def get_embedding_manager() -> EmbeddingManager:
+    return EmbeddingManager()
+
+@st.cache_resource
+def get_connection_manager() -> ConnectionManager:
+    connection_manager = ConnectionManager()
+    # Abre el pool de conexiones antes del primer mensaje
+    connection_manager.driver
+    return connection_manager
+
+def stream_response(rag_agent: RagAgent, message: str) -> str:
+    # Muestra las herramientas consultadas y la respuesta a medida que llegan
+    tools = None
+    placeholder = st.empty()
+    response = ""
+    for event in rag_agent.stream_msg(message, st.session_state.chat):
+        if event["type"] == "tool":
+            if tools is None:
+                tools = st.status("Consultando herramientas...")
+            tools.write(f"**{event['tool']}** `{event['input']}`")
+        else:
+            response += event["text"]
+            placeholder.markdown(response + "▌")
+    if tools is not None:
+        tools.update(label="Herramientas consultadas", state="complete")
+    placeholder.markdown(response)
+    return response
+
 def render_ui():
     env = EnvLoader()
     st.set_page_config(page_title="librerIA Chatbot", page_icon="📚")
     st.title("📚 librerIA Chatbot")
     
-    # Inicializar el agente RAG
-    rag_agent = RagAgent(env.agent_llm_model)
+    # Inicializar el agente RAG, el modelo de embeddings y la conexión a la BBDD
+    rag_agent = get_rag_agent(env.agent_llm_model)
+    get_embedding_manager()
+    get_connection_manager()
     
     # Estado inicial de sesión
     if "messages" not in st.session_state:
         st.session_state.messages = []
 
+    # Conversación de la sesión, con su propia memoria
+    if "chat" not in st.session_state:
+        st.session_state.chat = rag_agent.create_chat()
+
     # Inicializar el gestor de transcripciones
     if "transcript_manager" not in st.session_state:
         st.session_state.transcript_manager = None
@@ -36,8 +79,7 @@ def render_ui():
                 st.markdown(transcription)
             # Obtener respuesta del agente RAG
             with st.chat_message("assistant"):
-                response = rag_agent.send_msg(transcription)
-                st.markdown(response)
+                response = stream_response(rag_agent, transcription)
             # Guardar respuesta del asistente
             st.session_state.messages.append({"role": "assistant", "content": response})
 
@@ -55,8 +97,7 @@ def render_ui():
 
         # Obtener respuesta del agente RAG
         with st.chat_message("assistant"):
-            response = rag_agent.send_msg(user_input)
-            st.markdown(response)
+            response = stream_response(rag_agent, user_input)
         
         # Guardar respuesta del asistente
         st.session_state.messages.append({"role": "assistant", "content": response})